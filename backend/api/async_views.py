@@ -0,0 +1,210 @@
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.http import Http404
+from django.views import View
+from rest_framework.response import Response
+
+from api.caching import acached_response
+from api.mixins import CachedReadMixin
+from api.serializers import UserSubscribeSerializer
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+
+
+class AsyncReadView(View):
+    """
+    Асинхронное представление для чтения под ASGI.
+
+    GET обрабатывается в событийном цикле: пользователь берётся
+    из кэша токенов, данные — через async ORM, а queryset, фильтры,
+    проверки прав и сериализаторы — из синхронного viewset, чтобы
+    ответы совпадали. Остальные методы выполняет синхронный viewset
+    в потоке.
+    """
+
+    viewset = None
+    actions = None
+    basename = None
+    detail = False
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(
+            sync_view=cls.viewset.as_view(
+                cls.actions, basename=cls.basename, detail=cls.detail
+            ),
+            **initkwargs,
+        )
+        # Метки метрик и проверка CSRF — как у синхронного viewset.
+        view.cls = cls.viewset
+        view.actions = cls.actions
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method == 'GET':
+            return await self.get(request, *args, **kwargs)
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        view = self.get_viewset(request, kwargs)
+        try:
+            await self.authenticate(view.request)
+            view.initial(view.request, **kwargs)
+            response = await self.get_response(view)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        return view.finalize_response(view.request, response, **kwargs)
+
+    def get_viewset(self, request, kwargs):
+        action = self.actions['get']
+        view = self.viewset(
+            action_map=self.actions,
+            basename=self.basename,
+            detail=self.detail,
+            **getattr(getattr(self.viewset, action), 'kwargs', {}),
+        )
+        view.args = ()
+        view.kwargs = kwargs
+        view.headers = view.default_response_headers
+        view.request = view.initialize_request(request, **kwargs)
+        return view
+
+    async def authenticate(self, request):
+        """Аутентификация запроса DRF без обращения к базе при попадании."""
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None)
+            try:
+                if authenticate is not None:
+                    result = await authenticate(request)
+                else:
+                    result = await sync_to_async(authenticator.authenticate)(
+                        request
+                    )
+            except Exception:
+                request._not_authenticated()
+                raise
+            if result is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = result
+                return
+        request._not_authenticated()
+
+    async def get_response(self, view):
+        handler = partial(getattr(self, view.action), view)
+        if (
+            isinstance(view, CachedReadMixin)
+            and view.use_cache(view.request)
+        ):
+            return await acached_response(
+                view.request, view.get_cache_prefix(), handler
+            )
+        return await handler()
+
+    async def get_queryset(self, view):
+        return view.filter_queryset(view.get_queryset())
+
+    def get_serializer(self, view, instance, many=False):
+        return view.get_serializer(instance, many=many)
+
+    async def list(self, view):
+        queryset = await self.get_queryset(view)
+        if view.paginator is not None:
+            page = await view.paginator.apaginate_queryset(
+                queryset, view.request, view
+            )
+            if page is not None:
+                serializer = self.get_serializer(view, page, many=True)
+                return view.get_paginated_response(serializer.data)
+        if isinstance(queryset, QuerySet):
+            queryset = [obj async for obj in queryset]
+        return Response(
+            self.get_serializer(view, queryset, many=True).data
+        )
+
+    async def retrieve(self, view):
+        queryset = await self.get_queryset(view)
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{view.lookup_field: view.kwargs[lookup_url_kwarg]}
+            )
+        except (
+            queryset.model.DoesNotExist, TypeError, ValueError,
+            ValidationError,
+        ):
+            raise Http404
+        view.check_object_permissions(view.request, obj)
+        return Response(self.get_serializer(view, obj).data)
+
+
+class RecipeListView(AsyncReadView):
+    viewset = RecipeViewSet
+    actions = {'get': 'list', 'post': 'create'}
+    basename = 'recipes'
+
+
+class RecipeDetailView(AsyncReadView):
+    viewset = RecipeViewSet
+    actions = {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }
+    basename = 'recipes'
+    detail = True
+
+
+class TagListView(AsyncReadView):
+    viewset = TagViewSet
+    actions = {'get': 'list'}
+    basename = 'tags'
+
+
+class TagDetailView(AsyncReadView):
+    viewset = TagViewSet
+    actions = {'get': 'retrieve'}
+    basename = 'tags'
+    detail = True
+
+
+class IngredientListView(AsyncReadView):
+    viewset = IngredientViewSet
+    actions = {'get': 'list'}
+    basename = 'ingredients'
+
+    async def get_queryset(self, view):
+        # Поиск по индексу в памяти, который при устаревании
+        # перестраивается из базы синхронно.
+        return await sync_to_async(view.get_queryset)()
+
+
+class IngredientDetailView(AsyncReadView):
+    viewset = IngredientViewSet
+    actions = {'get': 'retrieve'}
+    basename = 'ingredients'
+    detail = True
+
+    async def get_queryset(self, view):
+        return view.queryset
+
+
+class SubscriptionsView(AsyncReadView):
+    viewset = UserViewSet
+    actions = {'get': 'subscriptions'}
+    basename = 'users'
+
+    async def get_queryset(self, view):
+        return view.get_subscriptions_queryset()
+
+    def get_serializer(self, view, instance, many=False):
+        return UserSubscribeSerializer(
+            instance, many=many, context={'request': view.request}
+        )
+
+    async def subscriptions(self, view):
+        return await self.list(view)
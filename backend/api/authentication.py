@@ -0,0 +1,80 @@
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+User = get_user_model()
+
+
+def get_token_cache_key(key):
+    return f'auth:credentials:{sha256(key.encode()).hexdigest()}'
+
+
+def invalidate_tokens(keys):
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+class TokenHeader(TokenAuthentication):
+    """Разбор заголовка Authorization без проверки токена."""
+
+    def authenticate_credentials(self, key):
+        return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшем: запрос к токену и пользователю
+    выполняется не чаще раза в AUTH_TOKEN_CACHE_TIMEOUT секунд.
+
+    В кэше хранятся только id и is_active пользователя, остальные
+    поля загружаются одним запросом при первом обращении к ним.
+    Запись сбрасывается при удалении токена (выход, в том числе
+    через QuerySet.delete) и при сохранении или удалении
+    пользователя. QuerySet.update сигналов не отправляет: после
+    User.objects.filter(...).update(is_active=False) токен действует
+    до истечения AUTH_TOKEN_CACHE_TIMEOUT, поэтому срок должен быть
+    коротким. Без общего кэша (Redis) сброс виден только процессу,
+    в котором произошло изменение.
+    """
+
+    def get_cached_credentials(self, key, cached):
+        user_id, is_active = cached
+        if not is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        user = User.from_db(
+            DEFAULT_DB_ALIAS, ('id', 'is_active'), (user_id, is_active)
+        )
+        return user, Token(key=key, user=user)
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return self.get_cached_credentials(key, cached)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(
+            cache_key, (user.pk, user.is_active),
+            settings.AUTH_TOKEN_CACHE_TIMEOUT,
+        )
+        return user, token
+
+    async def aauthenticate(self, request):
+        """
+        authenticate для асинхронных представлений: при попадании
+        в кэш пользователь берётся без перехода в поток.
+        """
+        key = TokenHeader().authenticate(request)
+        if key is None:
+            return None
+        cached = await cache.aget(get_token_cache_key(key))
+        if cached is not None:
+            return self.get_cached_credentials(key, cached)
+        return await sync_to_async(self.authenticate_credentials)(key)
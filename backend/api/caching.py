@@ -0,0 +1,112 @@
+import json
+from functools import partial
+from hashlib import md5
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+# Версия данных, которые ответы с рецептами берут из других моделей:
+# названия тэгов и ингредиентов, имя и почта автора.
+RECIPES_RELATED = 'recipes:related'
+
+
+def get_cache_version(prefix):
+    return cache.get_or_set(f'{prefix}:version', uuid4().hex, None)
+
+
+async def aget_cache_version(prefix):
+    return await cache.aget_or_set(f'{prefix}:version', uuid4().hex, None)
+
+
+def bump_cache_version(prefix):
+    """
+    Версия сбрасывается после фиксации транзакции: иначе параллельный
+    запрос успеет закэшировать под новой версией ещё старые данные.
+    Вне транзакции сбрасывается сразу.
+    """
+    transaction.on_commit(partial(cache.delete, f'{prefix}:version'))
+
+
+def invalidate_recipe(recipe_id):
+    bump_cache_version(f'recipes:{recipe_id}')
+    bump_cache_version('recipes:list')
+
+
+def get_request_key(request):
+    query = urlencode(sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    ))
+    return f'{request.get_host()}{request.path}?{query}'
+
+
+def get_prefixes(prefix):
+    """
+    prefix — префикс версии или кортеж префиксов, если ответ
+    устаревает при смене любой из их версий.
+    """
+    return (prefix, ) if isinstance(prefix, str) else tuple(prefix)
+
+
+def get_cache_key(request, prefix):
+    prefixes = get_prefixes(prefix)
+    versions = ':'.join(get_cache_version(name) for name in prefixes)
+    return f'{prefixes[0]}:{versions}:{get_request_key(request)}'
+
+
+async def aget_cache_key(request, prefix):
+    prefixes = get_prefixes(prefix)
+    versions = ':'.join([
+        await aget_cache_version(name) for name in prefixes
+    ])
+    return f'{prefixes[0]}:{versions}:{get_request_key(request)}'
+
+
+def get_etag(data):
+    content = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return quote_etag(md5(content.encode()).hexdigest())
+
+
+def get_etag_response(request, etag, data):
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(data, headers={'ETag': etag})
+
+
+def cached_response(request, prefix, get_response):
+    """
+    Возвращает закэшированный ответ с ETag
+    или 304, если клиент прислал совпадающий If-None-Match.
+    """
+    key = get_cache_key(request, prefix)
+    cached = cache.get(key)
+    if cached is None:
+        response = get_response()
+        if response.status_code != HTTP_200_OK:
+            return response
+        cached = get_etag(response.data), response.data
+        cache.set(key, cached)
+
+    return get_etag_response(request, *cached)
+
+
+async def acached_response(request, prefix, get_response):
+    """
+    cached_response для асинхронных представлений:
+    get_response — корутина.
+    """
+    key = await aget_cache_key(request, prefix)
+    cached = await cache.aget(key)
+    if cached is None:
+        response = await get_response()
+        if response.status_code != HTTP_200_OK:
+            return response
+        cached = get_etag(response.data), response.data
+        await cache.aset(key, cached)
+    return get_etag_response(request, *cached)
@@ -0,0 +1,27 @@
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework.fields import ImageField
+
+from api.validators import image_header_validator, image_size_validator
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Изображение рецепта строкой в Base64 или файлом из multipart-запроса.
+
+    Размер и разрешение проверяются до декодирования изображения:
+    для Base64 по длине строки, для файла по его заголовку.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            image_header_validator(data)
+            return ImageField.to_internal_value(self, data)
+
+        if isinstance(data, str):
+            encoded = data.rpartition(';base64,')[2]
+            image_size_validator(len(encoded) * 3 // 4)
+        image = super().to_internal_value(data)
+        if image is not None:
+            image_header_validator(image)
+        return image
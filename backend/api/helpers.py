@@ -1,7 +1,36 @@
-from django.apps import apps
-from django.db.models import F, Sum
+import csv
+from io import BytesIO
+from itertools import chain, islice
 
-from recipes.models import AmountIngredient
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+from rest_framework.exceptions import ValidationError
+
+from api.caching import bump_cache_version, invalidate_recipe
+from api.counters import change_counter
+from api.indexes import recipe_ingredient_index
+from recipes.feed import schedule_fan_out
+from recipes.images import schedule_image_processing
+from recipes.models import (AmountIngredient, Recipe, ShoppingListItem,
+                            SimilarityQueue)
+
+User = get_user_model()
+
+SEARCH_CONFIG = 'russian'
+SHOPLIST_CHUNK_SIZE = 500
+SHOPLIST_ASYNC_BATCH = 100
+SHOPLIST_PDF_FONT = 'ShoplistFont'
+UPLOAD_READ_SIZE = 64 * 1024
 
 
 def create_amount_ingredient(recipe, ingredients):
@@ -16,22 +45,307 @@ def create_amount_ingredient(recipe, ingredients):
             )
         )
     AmountIngredient.objects.bulk_create(ingredient_list)
+    invalidate_recipe(recipe.pk)
 
 
-def get_shoplist_ingredients(user):
-    shoplist = [
-        f'Список ингредиентов на покупку для \n\n{user.username}\n'
-    ]
-    Ingredient = apps.get_model('recipes', 'Ingredient')
-    ingredients = (
-        Ingredient.objects.filter(recipes__in_shopping_cart__user=user.id)
-        .values('name', measurement=F('measurement_unit'))
-        .annotate(amount=Sum('ingredient_recipe__amount'))
+def get_id_list(params, name):
+    """
+    Список id из параметра запроса: повторяющегося
+    (?ingredients=1&ingredients=2) или через запятую (?ingredients=1,2).
+    """
+    values = chain.from_iterable(
+        value.split(',') for value in params.getlist(name)
     )
-    ingredient_list = [
-        f'{ingredient["name"]}: '
-        f'{ingredient["amount"]} {ingredient["measurement"]}'
-        for ingredient in ingredients
+    try:
+        return [int(value) for value in values if value.strip()]
+    except ValueError:
+        raise ValidationError({name: 'Ожидался список целых чисел.'})
+
+
+def mark_similar_stale(recipe_ids):
+    """Ставит рецепты в очередь пересчёта похожих."""
+    SimilarityQueue.objects.bulk_create(
+        (SimilarityQueue(recipe=recipe_id) for recipe_id in recipe_ids),
+        update_conflicts=True,
+        unique_fields=('recipe', ),
+        update_fields=('added', ),
+    )
+
+
+def bulk_create_recipes(author, items):
+    """
+    Создаёт несколько рецептов одной транзакцией: по одному bulk_create
+    для рецептов, их тэгов и ингредиентов.
+    """
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=item['name'],
+                text=item['text'],
+                cooking_time=item['cooking_time'],
+                image=item['image'],
+            )
+            for item in items
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag)
+            for recipe, item in zip(recipes, items)
+            for tag in set(item['tags'])
+        )
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount'],
+            )
+            for recipe, item in zip(recipes, items)
+            for ingredient in item['ingredients']
+        )
+        change_counter(
+            User.objects.filter(pk=author.pk), 'recipes_count', len(recipes)
+        )
+        for recipe in recipes:
+            schedule_image_processing(recipe)
+        recipe_ids = [recipe.id for recipe in recipes]
+        mark_similar_stale(recipe_ids)
+        recipe_ingredient_index.update_later(recipe_ids)
+        schedule_fan_out(recipe_ids)
+    bump_cache_version('recipes:list')
+    return recipes
+
+
+def update_amount_ingredients(recipe, ingredients):
+    """
+    Приводит ингредиенты рецепта к новому составу, удаляя, изменяя
+    и добавляя только отличающиеся строки.
+    Возвращает прежние и новые количества.
+    """
+    current = {
+        amount.ingredient_id: amount
+        for amount in AmountIngredient.objects.filter(recipe=recipe)
+    }
+    old_amounts = {
+        ingredient: amount.amount for ingredient, amount in current.items()
+    }
+    new_amounts = {
+        ingredient.id: amount for ingredient, amount in ingredients.values()
+    }
+
+    removed = current.keys() - new_amounts.keys()
+    changed = []
+    for ingredient, amount in new_amounts.items():
+        if ingredient in current and current[ingredient].amount != amount:
+            current[ingredient].amount = amount
+            changed.append(current[ingredient])
+    added = [
+        AmountIngredient(
+            recipe=recipe, ingredient_id=ingredient, amount=amount
+        )
+        for ingredient, amount in new_amounts.items()
+        if ingredient not in current
     ]
-    shoplist.extend(ingredient_list)
-    return '\n'.join(shoplist)
+
+    if removed:
+        AmountIngredient.objects.filter(
+            recipe=recipe, ingredient__in=removed
+        ).delete()
+    if changed:
+        AmountIngredient.objects.bulk_update(changed, ('amount', ))
+    if added:
+        AmountIngredient.objects.bulk_create(added)
+    if removed or added:
+        mark_similar_stale((recipe.pk, ))
+        recipe_ingredient_index.update_later((recipe.pk, ))
+    if removed or changed or added:
+        invalidate_recipe(recipe.pk)
+    return old_amounts, new_amounts
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(
+        AmountIngredient.objects.filter(recipe=recipe_id)
+        .values_list('ingredient', 'amount')
+    )
+
+
+def update_shopping_lists(user_ids, deltas):
+    deltas = {
+        ingredient: delta for ingredient, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+
+    with transaction.atomic():
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient)
+                for user_id in user_ids
+                for ingredient in deltas
+            ],
+            ignore_conflicts=True,
+        )
+        items = ShoppingListItem.objects.filter(
+            user__in=user_ids, ingredient__in=deltas.keys()
+        )
+        items.update(total_amount=Greatest(
+            F('total_amount') + Case(
+                *(
+                    When(ingredient=ingredient, then=Value(delta))
+                    for ingredient, delta in deltas.items()
+                ),
+                default=Value(0),
+            ),
+            Value(0),
+        ))
+        items.filter(total_amount=0).delete()
+
+
+def update_recipe_shopping_lists(recipe, old_amounts, new_amounts=None):
+    if new_amounts is None:
+        new_amounts = get_recipe_amounts(recipe.pk)
+    deltas = {
+        ingredient: (
+            new_amounts.get(ingredient, 0) - old_amounts.get(ingredient, 0)
+        )
+        for ingredient in old_amounts.keys() | new_amounts.keys()
+    }
+    update_shopping_lists(
+        list(recipe.in_shopping_cart.values_list('user', flat=True)),
+        deltas,
+    )
+
+
+def get_shoplist_ingredients(user):
+    return (
+        ShoppingListItem.objects.filter(user=user.id)
+        .values(
+            name=F('ingredient__name'),
+            measurement=F('ingredient__measurement_unit'),
+            amount=F('total_amount'),
+        )
+        .order_by('name', 'measurement')
+        .iterator(chunk_size=SHOPLIST_CHUNK_SIZE)
+    )
+
+
+def get_shoplist_title(user):
+    return f'Список ингредиентов на покупку для \n\n{user.username}\n'
+
+
+def shoplist_txt(user):
+    yield get_shoplist_title(user)
+    for ingredient in get_shoplist_ingredients(user):
+        yield (
+            f'\n{ingredient["name"]}: '
+            f'{ingredient["amount"]} {ingredient["measurement"]}'
+        )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def shoplist_csv(user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for ingredient in get_shoplist_ingredients(user):
+        yield writer.writerow(
+            (ingredient['name'], ingredient['amount'],
+             ingredient['measurement'])
+        )
+
+
+def shoplist_pdf(user):
+    """
+    Список покупок в PDF. В отличие от txt и csv документ не потоковый:
+    Canvas reportlab держит все страницы в памяти до save(), а шрифт
+    встраивается в конце, поэтому файл целиком собирается в буфере
+    и только затем отдаётся частями.
+    """
+    if SHOPLIST_PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(SHOPLIST_PDF_FONT, settings.SHOPLIST_PDF_FONT)
+        )
+    buffer = BytesIO()
+    pdf = Canvas(buffer, pagesize=A4)
+    width, height = A4
+    margin = 50
+    line_height = 18
+    y = height - margin
+
+    pdf.setFont(SHOPLIST_PDF_FONT, 16)
+    pdf.drawString(
+        margin, y, f'Список ингредиентов на покупку для {user.username}'
+    )
+    y -= line_height * 2
+    pdf.setFont(SHOPLIST_PDF_FONT, 12)
+    for ingredient in get_shoplist_ingredients(user):
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont(SHOPLIST_PDF_FONT, 12)
+            y = height - margin
+        pdf.drawString(
+            margin, y,
+            f'{ingredient["name"]}: '
+            f'{ingredient["amount"]} {ingredient["measurement"]}'
+        )
+        y -= line_height
+    pdf.save()
+
+    buffer.seek(0)
+    while chunk := buffer.read(SHOPLIST_CHUNK_SIZE * 16):
+        yield chunk
+
+
+SHOPLIST_WRITERS = {
+    'txt': shoplist_txt,
+    'csv': shoplist_csv,
+    'pdf': shoplist_pdf,
+}
+
+
+async def aiter_chunks(chunks, batch=SHOPLIST_ASYNC_BATCH):
+    """
+    Асинхронный итератор по синхронному генератору для ответа под
+    ASGI: блоки читаются в потоке пачками по batch, а не собираются
+    в список целиком перед отправкой.
+    """
+    chunks = iter(chunks)
+    next_batch = sync_to_async(lambda: list(islice(chunks, batch)))
+    while part := await next_batch():
+        for chunk in part:
+            yield chunk
+
+
+def search_recipes(queryset, search):
+    query = SearchQuery(search, config=SEARCH_CONFIG, search_type='websearch')
+    return (
+        queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_similar=search)
+        )
+        .annotate(
+            rank=SearchRank(F('search_vector'), query)
+            + TrigramSimilarity('name', search)
+        )
+        .order_by('-rank', '-pub_date')
+    )
+
+
+def write_upload_chunk(upload, stream, length):
+    """
+    Дописывает часть загружаемого изображения с текущего смещения,
+    читая тело запроса небольшими блоками. Возвращает число байт.
+    """
+    written = 0
+    with upload.path.open('r+b') as file:
+        file.seek(upload.offset)
+        while written < length:
+            data = stream.read(min(UPLOAD_READ_SIZE, length - written))
+            if not data:
+                break
+            file.write(data)
+            written += len(data)
+        file.truncate()
+    return written
@@ -0,0 +1,206 @@
+from bisect import bisect_left
+from functools import partial, reduce
+from itertools import chain
+from threading import Lock
+from time import monotonic
+
+import numpy as np
+from django.db import transaction
+
+from recipes.models import AmountIngredient, Ingredient
+
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_INDEX_TTL = 300
+PANTRY_INDEX_TTL = 600
+FETCH_SIZE = 10_000
+PANTRY_SEARCH_LIMIT = 1000
+EMPTY_IDS = np.empty(0, dtype=np.int64)
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов в памяти процесса
+    для автодополнения без обращения к базе данных.
+    """
+
+    def __init__(self, ttl=INGREDIENT_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._names = None
+        self._ingredients = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._names = None
+            self._ingredients = None
+
+    def _get(self):
+        with self._lock:
+            if (
+                self._names is None
+                or monotonic() - self._built_at > self.ttl
+            ):
+                ingredients = sorted(
+                    Ingredient.objects.all(),
+                    key=lambda ing: (
+                        ing.name.casefold(),
+                        ing.measurement_unit,
+                    ),
+                )
+                self._names = [ing.name.casefold() for ing in ingredients]
+                self._ingredients = ingredients
+                self._built_at = monotonic()
+            return self._names, self._ingredients
+
+    def search(self, name, limit=INGREDIENT_SEARCH_LIMIT):
+        names, ingredients = self._get()
+        name = name.casefold()
+        start = bisect_left(names, name)
+        end = bisect_left(names, name + chr(0x10FFFF), start)
+
+        result = ingredients[start:min(end, start + limit)]
+        for i, ingredient_name in enumerate(names):
+            if len(result) >= limit:
+                break
+            if start <= i < end:
+                continue
+            if name in ingredient_name:
+                result.append(ingredients[i])
+        return result
+
+
+def fetch_pairs(queryset, fields):
+    """Пары id из базы в массив n×2 без создания объектов моделей."""
+    rows = queryset.order_by().values_list(*fields).iterator(
+        chunk_size=FETCH_SIZE
+    )
+    pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64)
+    return np.unique(pairs.reshape(-1, 2), axis=0)
+
+
+class RecipeIngredientIndex:
+    """
+    Инвертированный индекс ингредиентов в памяти процесса:
+    для каждого ингредиента — отсортированный массив id рецептов,
+    для каждого рецепта — число его ингредиентов.
+
+    Изменения рецептов этого процесса применяются после фиксации
+    транзакции, изменения из других процессов появляются после
+    перестроения по истечении ttl. Обновление не меняет массивы
+    на месте, а подменяет их копиями, поэтому поиск работает
+    с полученными массивами без блокировки.
+    """
+
+    def __init__(self, ttl=PANTRY_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._recipes = None
+        self._sizes = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._recipes = None
+            self._sizes = None
+
+    def _build(self):
+        pairs = fetch_pairs(
+            AmountIngredient.objects.all(), ('recipe_id', 'ingredient_id')
+        )
+        pairs = pairs[np.lexsort((pairs[:, 0], pairs[:, 1]))]
+        ingredients, starts = np.unique(pairs[:, 1], return_index=True)
+        self._recipes = dict(zip(
+            ingredients.tolist(), np.split(pairs[:, 0], starts[1:])
+        ))
+        self._sizes = np.bincount(pairs[:, 0])
+        self._built_at = monotonic()
+
+    def _get(self):
+        with self._lock:
+            if (
+                self._recipes is None
+                or monotonic() - self._built_at > self.ttl
+            ):
+                self._build()
+            return self._recipes, self._sizes
+
+    def update_later(self, recipe_ids):
+        """Обновляет рецепты в индексе после фиксации транзакции."""
+        if self._recipes is not None:
+            transaction.on_commit(partial(self.update, list(recipe_ids)))
+
+    def update(self, recipe_ids):
+        changed = np.unique(np.asarray(recipe_ids, dtype=np.int64))
+        pairs = fetch_pairs(
+            AmountIngredient.objects.filter(recipe__in=changed.tolist()),
+            ('recipe_id', 'ingredient_id'),
+        )
+        with self._lock:
+            if self._recipes is None or not len(changed):
+                return
+            recipes = dict(self._recipes)
+            sizes = self._sizes.copy()
+            if changed[-1] >= len(sizes):
+                sizes.resize(changed[-1] + 1, refcheck=False)
+            if sizes[changed].any():
+                for ingredient, ids in recipes.items():
+                    positions = np.searchsorted(ids, changed)
+                    found = positions < len(ids)
+                    found[found] = ids[positions[found]] == changed[found]
+                    if found.any():
+                        recipes[ingredient] = np.delete(ids, positions[found])
+            for ingredient in np.unique(pairs[:, 1]).tolist():
+                recipes[ingredient] = np.union1d(
+                    recipes.get(ingredient, EMPTY_IDS),
+                    pairs[pairs[:, 1] == ingredient, 0],
+                )
+            sizes[changed] = 0
+            np.add.at(sizes, pairs[:, 0], 1)
+            self._recipes = recipes
+            self._sizes = sizes
+
+    def search(self, include, exclude=(), min_match=None,
+               limit=PANTRY_SEARCH_LIMIT):
+        """
+        id рецептов, в которых есть не меньше min_match ингредиентов
+        из include (по умолчанию все) и нет ни одного из exclude.
+        Рецепты упорядочены по доле своих ингредиентов, которые есть
+        в include, затем по числу совпавших и по убыванию id;
+        возвращаются первые limit из них.
+        """
+        recipes, sizes = self._get()
+        include = [
+            recipes.get(ingredient, EMPTY_IDS) for ingredient in set(include)
+        ]
+        if not include:
+            return []
+        min_match = min(min_match or len(include), len(include))
+
+        if min_match == len(include):
+            ids = reduce(
+                partial(np.intersect1d, assume_unique=True),
+                sorted(include, key=len),
+            )
+            matched = np.full(len(ids), len(include))
+        else:
+            ids, matched = np.unique(
+                np.concatenate(include), return_counts=True
+            )
+            enough = matched >= min_match
+            ids, matched = ids[enough], matched[enough]
+
+        excluded = [
+            recipes.get(ingredient, EMPTY_IDS) for ingredient in set(exclude)
+        ]
+        if excluded:
+            allowed = ~np.isin(ids, np.concatenate(excluded))
+            ids, matched = ids[allowed], matched[allowed]
+
+        coverage = matched / sizes[ids]
+        order = np.lexsort((-ids, -matched, -coverage))[:limit]
+        return ids[order].tolist()
+
+
+ingredient_index = IngredientIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
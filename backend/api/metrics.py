@@ -0,0 +1,83 @@
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Histogram, generate_latest,
+                               multiprocess)
+
+LABELS = ('view', 'method')
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, float('inf'))
+SIZE_BUCKETS = tuple(256 * 4 ** power for power in range(8)) + (float('inf'),)
+
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds',
+    'Время обработки запроса.',
+    LABELS + ('status', ),
+)
+SQL_QUERIES = Histogram(
+    'api_sql_queries',
+    'Количество SQL-запросов на один запрос к API.',
+    LABELS,
+    buckets=QUERY_BUCKETS,
+)
+SQL_DURATION = Histogram(
+    'api_sql_duration_seconds',
+    'Суммарное время SQL-запросов на один запрос к API.',
+    LABELS,
+)
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes',
+    'Размер тела ответа.',
+    LABELS,
+    buckets=SIZE_BUCKETS,
+)
+
+
+def get_view_name(view_func, method):
+    """
+    Имя представления для меток: RecipeViewSet.list,
+    UserViewSet.subscriptions или имя функции.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        view_class = getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def observe(view, method, status, duration, queries, sql_duration, size):
+    REQUEST_LATENCY.labels(view, method, status).observe(duration)
+    SQL_QUERIES.labels(view, method).observe(queries)
+    SQL_DURATION.labels(view, method).observe(sql_duration)
+    if size is not None:
+        RESPONSE_SIZE.labels(view, method).observe(size)
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus. Доступны только с токеном
+    METRICS_TOKEN: пока он не задан, эндпоинт отвечает 404.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    if not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,90 @@
+from time import perf_counter
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.db import connection
+
+from api.metrics import get_view_name, observe
+
+
+class QueryCounter:
+    """Обёртка выполнения SQL, считающая запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+
+
+def add_query_counter(counter):
+    connection.execute_wrappers.append(counter)
+
+
+def remove_query_counter(counter):
+    connection.execute_wrappers.remove(counter)
+
+
+class MetricsMiddleware:
+    """
+    Собирает для каждого представления время ответа, число и время
+    SQL-запросов и размер ответа в гистограммы Prometheus.
+
+    Под ASGI запросы к базе выполняются в потоке запроса, поэтому
+    счётчик подключается к соединению этого потока.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        start = perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        self.observe(request, response, perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        start = perf_counter()
+        await sync_to_async(add_query_counter)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_query_counter)(counter)
+        self.observe(request, response, perf_counter() - start, counter)
+        return response
+
+    def observe(self, request, response, duration, counter):
+        match = request.resolver_match
+        if match is None:
+            view = 'unresolved'
+        else:
+            view = get_view_name(match.func, request.method)
+        if response.streaming:
+            size = None
+        else:
+            size = len(response.content)
+        observe(
+            view,
+            request.method,
+            response.status_code,
+            duration,
+            counter.count,
+            counter.duration,
+            size,
+        )
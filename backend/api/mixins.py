@@ -1,3 +1,6 @@
+from functools import partial
+
+from django.db import transaction
 from django.db.models import Model, Q
 from django.db.utils import IntegrityError
 from django.shortcuts import get_object_or_404
@@ -6,6 +9,7 @@ from rest_framework.serializers import ModelSerializer
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN)
 
+from api.caching import cached_response
 from users.models import Subscriptions
 
 
@@ -16,7 +20,10 @@ class CreateDeleteViewMixin():
     def create_relation_recipe(self, obj_id) -> Response:
         obj = get_object_or_404(self.queryset, pk=obj_id)
         try:
-            self.link_model(None, recipe=obj, user=self.request.user).save()
+            with transaction.atomic():
+                self.link_model(
+                    None, recipe=obj, user=self.request.user
+                ).save()
         except IntegrityError:
             return Response(
                 {'error': 'Действие невозможно выполнить.'},
@@ -41,7 +48,8 @@ class CreateDeleteViewMixin():
                 status=HTTP_403_FORBIDDEN,
             )
         try:
-            self.link_model(None, author=obj, user=user).save()
+            with transaction.atomic():
+                self.link_model(None, author=obj, user=user).save()
         except IntegrityError:
             return Response(
                 {'error': 'Действие невозможно выполнить.'},
@@ -56,15 +64,43 @@ class CreateDeleteViewMixin():
                         status=HTTP_201_CREATED)
 
     def delete_relation(self, q: Q) -> Response:
-        to_delete = (
-            self.link_model.objects.filter(q & Q(user=self.request.user))
-            .first()
-            .delete()
-        )
-        if not to_delete:
-            return Response(
-                {'error': 'Действие невозможно выполнить.'},
-                status=HTTP_400_BAD_REQUEST
-            )
+        with transaction.atomic():
+            to_delete = self.link_model.objects.filter(
+                q & Q(user=self.request.user)
+            ).first()
+            if to_delete is None:
+                return Response(
+                    {'error': 'Действие невозможно выполнить.'},
+                    status=HTTP_400_BAD_REQUEST
+                )
+            to_delete.delete()
 
         return Response(status=HTTP_204_NO_CONTENT)
+
+
+class CachedReadMixin():
+    cache_prefix: str
+
+    def get_cache_prefix(self):
+        return self.cache_prefix
+
+    def use_cache(self, request):
+        return True
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_cache(request):
+            return super().list(request, *args, **kwargs)
+        return cached_response(
+            request,
+            self.get_cache_prefix(),
+            partial(super().list, request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_cache(request):
+            return super().retrieve(request, *args, **kwargs)
+        return cached_response(
+            request,
+            self.get_cache_prefix(),
+            partial(super().retrieve, request, *args, **kwargs),
+        )
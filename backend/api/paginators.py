@@ -1,5 +1,168 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с параметром limit.
+
+    Если в запросе передан параметр cursor, а у представления задано
+    поле cursor_ordering, используется keyset-пагинация: следующая
+    страница выбирается условием по полям сортировки вместо OFFSET
+    и без подсчёта COUNT(*).
+
+    Без limit и cursor список отдаётся целиком, как и раньше.
+    """
+
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_page_size = 6
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_cursor_page_size(self, request):
+        return self.get_page_size(request) or self.cursor_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_queryset = self.get_cursor_queryset(queryset, request, view)
+        if cursor_queryset is None:
+            return super().paginate_queryset(queryset, request, view)
+        return self.set_cursor_results(list(cursor_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset для асинхронных представлений: подсчёт
+        и выборка страницы выполняются через async ORM.
+        """
+        cursor_queryset = self.get_cursor_queryset(queryset, request, view)
+        if cursor_queryset is not None:
+            return self.set_cursor_results(
+                [obj async for obj in cursor_queryset]
+            )
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        bottom = (number - 1) * page_size
+        object_list = [
+            obj async for obj in queryset[bottom:bottom + page_size]
+        ]
+        self.page = Page(object_list, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+    def get_cursor_queryset(self, queryset, request, view):
+        """
+        Срез queryset для keyset-страницы с одной лишней записью,
+        по которой видно, есть ли следующая страница. None, если
+        курсор не запрошен или представление его не поддерживает.
+        """
+        self.cursor_ordering = getattr(view, 'cursor_ordering', None)
+        if (
+            self.cursor_ordering is None
+            or self.cursor_query_param not in request.query_params
+        ):
+            self.cursor_ordering = None
+            return None
+
+        self.request = request
+        self.limit = self.get_cursor_page_size(request)
+        queryset = queryset.order_by(*self.cursor_ordering)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            try:
+                queryset = queryset.filter(self.get_cursor_filter(cursor))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.limit + 1]
+
+    def set_cursor_results(self, results):
+        self.has_next = len(results) > self.limit
+        self.results = results[:self.limit]
+        return self.results
+
+    def get_paginated_response(self, data):
+        if self.cursor_ordering is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict((
+            ('next', self.get_next_cursor_link()),
+            ('results', data),
+        )))
+
+    def paginate_source(self, get_results, request, cursor_ordering):
+        """
+        Keyset-пагинация по источнику, который не сводится к одному
+        queryset: get_results(values, limit) возвращает до limit
+        объектов после курсора values (None — с начала) в порядке
+        cursor_ordering.
+        """
+        self.request = request
+        self.cursor_ordering = cursor_ordering
+        self.limit = self.get_cursor_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            values = self.decode_cursor(cursor) if cursor else None
+            results = get_results(values, self.limit + 1)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return self.set_cursor_results(results)
+
+    def decode_cursor(self, cursor):
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+        if (
+            not isinstance(values, list)
+            or len(values) != len(self.cursor_ordering)
+        ):
+            raise ValueError(self.invalid_cursor_message)
+        return values
+
+    def get_cursor_filter(self, cursor):
+        values = self.decode_cursor(cursor)
+        condition = Q()
+        equal = Q()
+        for ordering, value in zip(self.cursor_ordering, values):
+            field = ordering.lstrip('-')
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+
+        first = self.cursor_ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def encode_cursor(self, obj):
+        values = [
+            str(getattr(obj, ordering.lstrip('-')))
+            for ordering in self.cursor_ordering
+        ]
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.results[-1])
+        )
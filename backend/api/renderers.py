@@ -0,0 +1,35 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoplistRenderer(BaseRenderer):
+    """
+    Рендерер форматов списка покупок.
+
+    Сам список отдаётся потоком из представления,
+    здесь отрисовываются только ответы с ошибками.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class ShoplistTxtRenderer(ShoplistRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class ShoplistCSVRenderer(ShoplistRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ShoplistPDFRenderer(ShoplistRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
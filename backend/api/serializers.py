@@ -1,13 +1,23 @@
+import json
+
 from django.contrib.auth import get_user_model
-from django.db.models import F
-from drf_extra_fields.fields import Base64ImageField
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from rest_framework.serializers import (IntegerField, ListField,
+                                        ListSerializer, ModelSerializer,
+                                        PrimaryKeyRelatedField, ReadOnlyField,
+                                        Serializer, SerializerMethodField)
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.helpers import create_amount_ingredient
-from api.validators import ingredient_validator, tag_validator
-from recipes.models import Ingredient, Recipe, Tag
+from api.fields import RecipeImageField
+from api.helpers import (bulk_create_recipes, create_amount_ingredient,
+                         update_amount_ingredients,
+                         update_recipe_shopping_lists)
+from api.validators import (image_size_validator, ingredient_validator,
+                            tag_validator)
+from recipes.models import (ImageUpload, Ingredient, Recipe, ShoppingListItem,
+                            Tag)
 from users.models import Subscriptions
 
 User = get_user_model()
@@ -44,6 +54,8 @@ class UserSerializer(ModelSerializer):
         read_only_fields = ('is_subscribed', )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -63,7 +75,6 @@ class UserSerializer(ModelSerializer):
 
 class UserSubscribeSerializer(UserSerializer):
     recipes = SerializerMethodField()
-    recipes_count = SerializerMethodField()
 
     class Meta:
         model = User
@@ -76,6 +87,7 @@ class UserSubscribeSerializer(UserSerializer):
             'is_subscribed',
             'recipes',
             'recipes_count',
+            'followers_count',
         )
         read_only_fields = (
             'id',
@@ -85,6 +97,7 @@ class UserSubscribeSerializer(UserSerializer):
             'email',
             'recipes',
             'recipes_count',
+            'followers_count',
             'is_subscribed',
         )
         validators = [
@@ -99,7 +112,7 @@ class UserSubscribeSerializer(UserSerializer):
         request = self.context.get('request')
         limit = request.query_params.get('recipes_limit')
         recipes = obj.recipes.all()
-        if limit:
+        if limit and limit.isdigit():
             recipes = recipes[:int(limit)]
         serializer = UserRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
@@ -107,9 +120,6 @@ class UserSubscribeSerializer(UserSerializer):
     def get_is_subscribed(self, obj):
         return True
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class TagSerializer(ModelSerializer):
 
@@ -151,13 +161,51 @@ class IngredientSerializer(ModelSerializer):
         read_only_fields = ('id', 'name', 'measurement_unit', )
 
 
+class ShoppingListItemSerializer(ModelSerializer):
+    id = ReadOnlyField(source='ingredient.id')
+    name = ReadOnlyField(source='ingredient.name')
+    measurement_unit = ReadOnlyField(source='ingredient.measurement_unit')
+    amount = ReadOnlyField(source='total_amount')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = (
+            'id',
+            'name',
+            'measurement_unit',
+            'amount',
+        )
+
+
+class ImageUploadSerializer(ModelSerializer):
+
+    class Meta:
+        model = ImageUpload
+        fields = (
+            'id',
+            'size',
+            'offset',
+        )
+        read_only_fields = ('id', 'offset', )
+
+    def validate_size(self, size):
+        image_size_validator(size)
+        return size
+
+
 class RecipeSerializer(ModelSerializer):
     tags = TagSerializer(many=True, read_only=True, )
     author = UserSerializer(read_only=True, )
     ingredients = SerializerMethodField()
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
-    image = Base64ImageField()
+    image = RecipeImageField(required=False, )
+    image_upload = PrimaryKeyRelatedField(
+        queryset=ImageUpload.objects.all(),
+        write_only=True,
+        required=False,
+    )
+    image_variants = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -170,45 +218,110 @@ class RecipeSerializer(ModelSerializer):
             'cooking_time',
             'text',
             'image',
+            'image_upload',
+            'image_variants',
             'is_favorited',
             'is_in_shopping_cart',
+            'favourites_count',
         )
         read_only_fields = (
             'is_favorited',
             'is_in_shopping_cart',
+            'favourites_count',
         )
 
     def get_ingredients(self, recipe):
-        ingredients = recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredient_recipe__amount'),
-        )
-        return ingredients
+        amounts = recipe.in_recipe.all()
+        if 'in_recipe' not in getattr(
+            recipe, '_prefetched_objects_cache', {}
+        ):
+            amounts = amounts.select_related('ingredient').order_by(
+                'ingredient__name'
+            )
+        return [
+            {
+                'id': amount.ingredient.id,
+                'name': amount.ingredient.name,
+                'measurement_unit': amount.ingredient.measurement_unit,
+                'amount': amount.amount,
+            }
+            for amount in amounts
+        ]
+
+    def get_image_variants(self, recipe):
+        request = self.context.get('request')
+        return {
+            variant: {
+                extension: request.build_absolute_uri(
+                    default_storage.url(path)
+                )
+                for extension, path in paths.items()
+            }
+            for variant, paths in recipe.image_variants.items()
+        }
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         user = self.context.get('view').request.user
         if user.is_anonymous:
             return False
         return user.favourites.filter(recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.context.get('view').request.user
         if user.is_anonymous:
             return False
         return user.shopping_cart.filter(recipe=recipe).exists()
 
+    def get_initial_list(self, field):
+        """
+        В multipart-запросе списки передаются повторяющимися полями
+        (объекты — строками JSON) или одним полем со строкой JSON.
+        """
+        if not hasattr(self.initial_data, 'getlist'):
+            return self.initial_data.get(field)
+        values = self.initial_data.getlist(field)
+        if len(values) == 1 and values[0].lstrip().startswith('['):
+            return self.decode_initial_json(field, values[0])
+        return [
+            self.decode_initial_json(field, value)
+            if value.lstrip().startswith('{') else value
+            for value in values
+        ]
+
+    def decode_initial_json(self, field, value):
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise ValidationError({field: 'Неверный формат списка.'})
+
+    def validate_image_upload(self, upload):
+        if upload.user != self.context.get('request').user:
+            raise ValidationError('Загрузка не найдена.')
+        if not upload.is_complete:
+            raise ValidationError('Изображение загружено не полностью.')
+        return upload
+
     def validate(self, data):
         request = self.context.get('request')
-        tags_ids = self.initial_data.get('tags')
-        ingredients = self.initial_data.get('ingredients')
+        tags_ids = self.get_initial_list('tags')
+        ingredients = self.get_initial_list('ingredients')
         name = self.initial_data.get('name')
 
-        if Recipe.objects.filter(
+        if (
+            request.method == 'POST'
+            and 'image' not in data
+            and 'image_upload' not in data
+        ):
+            raise ValidationError({'image': 'Не передано изображение.'})
+
+        if request.method == 'POST' and Recipe.objects.filter(
             author=self.context.get('request').user,
             name=name
-        ).exists() and request.method == 'POST':
+        ).exists():
             raise ValidationError(
                 'Рецепт с таким названием уже '
                 'был создан ранее. '
@@ -226,6 +339,16 @@ class RecipeSerializer(ModelSerializer):
         )
         return data
 
+    def save(self, **kwargs):
+        upload = self.validated_data.pop('image_upload', None)
+        if upload is None:
+            return super().save(**kwargs)
+        with upload.open() as image:
+            recipe = super().save(image=image, **kwargs)
+        upload.delete()
+        return recipe
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -244,19 +367,105 @@ class RecipeSerializer(ModelSerializer):
                 'Вы не можете редактировать чужой рецепт. '
             )
 
-        for key, value in validated_data.items():
-            if hasattr(recipe, key):
-                setattr(recipe, key, value)
-        if tags:
-            recipe.tags.clear()
-            recipe.tags.set(tags)
         if not ingredients:
             raise ValidationError(
                 'Вы не можете удалить из рецепта все ингредиенты. '
             )
-        else:
-            recipe.ingredients.clear()
-            create_amount_ingredient(recipe, ingredients)
 
-        recipe.save()
+        changed_fields = [
+            key for key, value in validated_data.items()
+            if hasattr(recipe, key) and getattr(recipe, key) != value
+        ]
+        with transaction.atomic():
+            for key in changed_fields:
+                setattr(recipe, key, validated_data[key])
+            if changed_fields:
+                recipe.save(update_fields=changed_fields)
+            if tags:
+                recipe.tags.set(tags)
+            old_amounts, new_amounts = update_amount_ingredients(
+                recipe, ingredients
+            )
+            if old_amounts != new_amounts:
+                update_recipe_shopping_lists(
+                    recipe, old_amounts, new_amounts
+                )
         return recipe
+
+
+class AmountSerializer(Serializer):
+    id = IntegerField()
+    amount = IntegerField(min_value=1, max_value=1000)
+
+
+class RecipeBulkListSerializer(ListSerializer):
+    """
+    Проверяет все рецепты пакета вместе: тэги, ингредиенты
+    и названия одним запросом на каждую таблицу.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        author = self.context.get('request').user
+        tags = set(Tag.objects.filter(
+            id__in={tag for item in items for tag in item['tags']}
+        ).values_list('id', flat=True))
+        ingredients = set(Ingredient.objects.filter(
+            id__in={
+                ingredient['id']
+                for item in items for ingredient in item['ingredients']
+            }
+        ).values_list('id', flat=True))
+        names = set(Recipe.objects.filter(
+            author=author, name__in={item['name'] for item in items}
+        ).values_list('name', flat=True))
+
+        errors = []
+        for item in items:
+            error = {}
+            if set(item['tags']) - tags:
+                error['tags'] = ['Указан несуществующий тэг.']
+            ingredient_ids = [
+                ingredient['id'] for ingredient in item['ingredients']
+            ]
+            if set(ingredient_ids) - ingredients:
+                error['ingredients'] = ['Указан несуществующий ингредиент.']
+            elif len(set(ingredient_ids)) != len(ingredient_ids):
+                error['ingredients'] = ['Ингредиенты повторяются.']
+            if item['name'] in names:
+                error['name'] = [
+                    'Рецепт с таким названием уже был создан ранее.'
+                ]
+            names.add(item['name'])
+            errors.append(error)
+        if any(errors):
+            raise ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        try:
+            return bulk_create_recipes(
+                self.context.get('request').user, validated_data
+            )
+        except IntegrityError:
+            raise ValidationError(
+                'Рецепт с таким названием уже был создан ранее.'
+            )
+
+
+class RecipeBulkSerializer(ModelSerializer):
+    image = RecipeImageField()
+    tags = ListField(child=IntegerField(), allow_empty=False)
+    ingredients = AmountSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'name',
+            'text',
+            'cooking_time',
+            'image',
+            'tags',
+            'ingredients',
+        )
+        list_serializer_class = RecipeBulkListSerializer
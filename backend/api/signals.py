@@ -0,0 +1,186 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens
+from api.caching import RECIPES_RELATED, bump_cache_version, invalidate_recipe
+from api.counters import change_counter
+from api.helpers import (get_recipe_amounts, mark_similar_stale,
+                         update_shopping_lists)
+from api.indexes import ingredient_index, recipe_ingredient_index
+from recipes.feed import (add_author_to_feed, remove_author_from_feed,
+                          schedule_fan_out)
+from recipes.models import (AmountIngredient, Favourites, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import CustomUser, Subscriptions
+
+# Поля пользователя, которые попадают в ответы с рецептами автора.
+RECIPE_AUTHOR_FIELDS = frozenset(
+    ('username', 'email', 'first_name', 'last_name')
+)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+    bump_cache_version('ingredients')
+    bump_cache_version(RECIPES_RELATED)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_cache_version('tags')
+    bump_cache_version(RECIPES_RELATED)
+
+
+@receiver((post_save, post_delete), sender=CustomUser)
+def invalidate_recipe_authors(update_fields=None, **kwargs):
+    # Вход сохраняет только last_login — рецепты от этого не меняются.
+    if update_fields is None or RECIPE_AUTHOR_FIELDS & update_fields:
+        bump_cache_version(RECIPES_RELATED)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_cache(instance, **kwargs):
+    invalidate_recipe(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=AmountIngredient)
+def invalidate_recipe_ingredients_cache(instance, **kwargs):
+    invalidate_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_recipe_relations_cache(instance, action, reverse, pk_set,
+                                      **kwargs):
+    if not action.startswith('post_'):
+        return
+    recipe_ids = (pk_set or ()) if reverse else (instance.pk, )
+    for recipe_id in recipe_ids:
+        bump_cache_version(f'recipes:{recipe_id}')
+    bump_cache_version('recipes:list')
+
+
+@receiver(post_save, sender=Recipe)
+def mark_new_recipe_similar(instance, created, **kwargs):
+    if created:
+        mark_similar_stale((instance.pk, ))
+
+
+@receiver((post_save, post_delete), sender=AmountIngredient)
+def mark_recipe_ingredients_similar(instance, **kwargs):
+    mark_similar_stale((instance.recipe_id, ))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def mark_recipe_tags_similar(instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        mark_similar_stale(
+            (pk_set or ()) if reverse else (instance.pk, )
+        )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipe_ingredient_index(instance, created=True, **kwargs):
+    if created:
+        recipe_ingredient_index.update_later((instance.pk, ))
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(instance, created, **kwargs):
+    if created:
+        schedule_fan_out((instance.pk, ))
+
+
+@receiver(post_save, sender=Subscriptions)
+def add_subscription_to_feed(instance, created, **kwargs):
+    if created:
+        add_author_to_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def remove_subscription_from_feed(instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver((post_save, post_delete), sender=AmountIngredient)
+def update_amount_ingredient_index(instance, **kwargs):
+    recipe_ingredient_index.update_later((instance.recipe_id, ))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        update_shopping_lists(
+            [instance.user_id], get_recipe_amounts(instance.recipe_id)
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    update_shopping_lists(
+        [instance.user_id],
+        {
+            ingredient: -amount
+            for ingredient, amount
+            in get_recipe_amounts(instance.recipe_id).items()
+        },
+    )
+
+
+@receiver((post_save, post_delete), sender=Favourites)
+def count_favourites(instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            'favourites_count',
+            1 if signal is post_save else -1,
+        )
+        # UPDATE счётчика не вызывает сигналов Recipe. Страница рецепта
+        # обновляется сразу, а списки догоняют за CACHE_TIMEOUT: сброс
+        # общей версии списков на каждое избранное обнулил бы их кэш.
+        bump_cache_version(f'recipes:{instance.recipe_id}')
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def count_carts(instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            'in_carts_count',
+            1 if signal is post_save else -1,
+        )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def count_author_recipes(instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'recipes_count',
+            1 if signal is post_save else -1,
+        )
+
+
+@receiver((post_save, post_delete), sender=Subscriptions)
+def count_followers(instance, signal, created=True, **kwargs):
+    if created:
+        change_counter(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'followers_count',
+            1 if signal is post_save else -1,
+        )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_tokens((instance.key, ))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(instance, **kwargs):
+    invalidate_tokens(
+        Token.objects.filter(user=instance.pk).values_list('key', flat=True)
+    )
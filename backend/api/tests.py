@@ -0,0 +1,272 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import get_token_cache_key
+from recipes.models import (AmountIngredient, Favourites, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import CustomUser, Subscriptions
+
+AUTHORS = 55
+RECIPES_PER_AUTHOR = 2
+PAGE_SIZES = (6, 50)
+
+# Рецепты: COUNT и страница, затем prefetch тэгов и ингредиентов.
+# Флаги избранного и корзины — аннотации той же страницы.
+RECIPE_LIST_QUERIES = 4
+# Авторы с признаком подписки — одним prefetch на страницу.
+AUTHORS_QUERIES = 1
+# Подписки: COUNT и страница авторов, prefetch их последних рецептов.
+SUBSCRIPTIONS_QUERIES = 3
+# Токен и пользователь читаются одним запросом.
+AUTH_QUERIES = 1
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    },
+)
+class QueryCountTests(TestCase):
+    """
+    Число SQL-запросов списков не зависит от размера страницы:
+    связи загружаются prefetch и аннотациями, а не по запросу
+    на объект. Кэш отключён, чтобы каждый ответ собирался из базы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            password='password', first_name='Читатель', last_name='Тестов',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        tags = [
+            Tag.objects.create(
+                name=f'Тэг {number}', color=f'#00000{number}',
+                slug=f'tag{number}',
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г',
+            )
+            for number in range(3)
+        ]
+        for number in range(AUTHORS):
+            author = CustomUser.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                password='password', first_name='Автор', last_name='Тестов',
+            )
+            Subscriptions.objects.create(user=cls.user, author=author)
+            for index in range(RECIPES_PER_AUTHOR):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}-{index}',
+                    text='Описание', cooking_time=10,
+                    image='recipe_images/test.jpg',
+                )
+                recipe.tags.set(tags[:index + 1])
+                AmountIngredient.objects.bulk_create(
+                    AmountIngredient(
+                        recipe=recipe, ingredient=ingredient, amount=100,
+                    )
+                    for ingredient in ingredients
+                )
+                if number % 2:
+                    Favourites.objects.create(user=cls.user, recipe=recipe)
+                    ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def assert_queries(self, client, url, queries):
+        for page_size in PAGE_SIZES:
+            with self.subTest(url=url, limit=page_size):
+                with self.assertNumQueries(queries):
+                    response = client.get(url, {'limit': page_size})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_recipe_list_anonymous(self):
+        self.assert_queries(
+            self.anonymous, '/api/recipes/', RECIPE_LIST_QUERIES,
+        )
+
+    def test_recipe_list_authorized(self):
+        self.assert_queries(
+            self.authorized, '/api/recipes/',
+            AUTH_QUERIES + RECIPE_LIST_QUERIES + AUTHORS_QUERIES,
+        )
+
+    def test_subscriptions(self):
+        self.assert_queries(
+            self.authorized, '/api/users/subscriptions/',
+            AUTH_QUERIES + SUBSCRIPTIONS_QUERIES,
+        )
+
+
+class ShoppingListTests(TestCase):
+    """
+    Итоги списка покупок пересчитываются разницей количеств
+    при изменении корзины и при редактировании рецепта.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            password='password', first_name='Покупатель', last_name='Тестов',
+        )
+        cls.author = CustomUser.objects.create_user(
+            username='kitchen', email='kitchen@example.com',
+            password='password', first_name='Повар', last_name='Тестов',
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#000000', slug='lunch',
+        )
+        cls.flour, cls.sugar, cls.salt = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'соль')
+        )
+        cls.cake = cls.create_recipe(
+            'Пирог', {cls.flour: 100, cls.sugar: 50},
+        )
+        cls.bread = cls.create_recipe('Хлеб', {cls.flour: 30})
+
+    @classmethod
+    def create_recipe(cls, name, amounts):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Описание', cooking_time=10,
+            image='recipe_images/test.jpg',
+        )
+        recipe.tags.set((cls.tag, ))
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe=recipe, ingredient=ingredient, amount=amount,
+            )
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_totals(self, user=None):
+        return dict(
+            ShoppingListItem.objects.filter(user=user or self.user)
+            .values_list('ingredient', 'total_amount')
+        )
+
+    def add_to_cart(self, *recipes):
+        for recipe in recipes:
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, 201)
+
+    def test_add_to_cart(self):
+        self.add_to_cart(self.cake)
+        self.assertEqual(
+            self.get_totals(), {self.flour.id: 100, self.sugar.id: 50},
+        )
+        self.add_to_cart(self.bread)
+        self.assertEqual(
+            self.get_totals(), {self.flour.id: 130, self.sugar.id: 50},
+        )
+
+    def test_remove_from_cart(self):
+        self.add_to_cart(self.cake, self.bread)
+        response = self.client.delete(
+            f'/api/recipes/{self.cake.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_totals(), {self.flour.id: 30})
+
+    def test_recipe_edit(self):
+        self.add_to_cart(self.cake, self.bread)
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.patch(
+            f'/api/recipes/{self.cake.id}/',
+            {
+                'name': self.cake.name,
+                'text': self.cake.text,
+                'cooking_time': self.cake.cooking_time,
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.flour.id, 'amount': 40},
+                    {'id': self.salt.id, 'amount': 5},
+                ],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.get_totals(), {self.flour.id: 70, self.salt.id: 5},
+        )
+        self.assertEqual(self.get_totals(self.author), {})
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-cache-tests',
+        },
+    },
+)
+class TokenCacheTests(TestCase):
+    """
+    Закэшированная проверка токена сбрасывается при выходе,
+    деактивации пользователя и смене пароля.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='member', email='member@example.com',
+            password='password', first_name='Участник', last_name='Тестов',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.cache_key = get_token_cache_key(self.token.key)
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertIsNotNone(cache.get(self.cache_key))
+
+    def get_me(self):
+        return self.client.get('/api/users/me/')
+
+    def test_logout(self):
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(cache.get(self.cache_key))
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(cache.get(self.cache_key))
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_password_change(self):
+        response = self.client.post(
+            '/api/users/set_password/',
+            {'current_password': 'password', 'new_password': 'n3w-Passw0rd'},
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(cache.get(self.cache_key))
+        response = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], self.user.username)
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.async_views import (IngredientDetailView, IngredientListView,
+                             RecipeDetailView, RecipeListView,
+                             SubscriptionsView, TagDetailView, TagListView)
+from api.metrics import metrics_view
+from api.views import (ImageUploadViewSet, IngredientViewSet, RecipeViewSet,
+                       TagViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -11,8 +17,23 @@ router.register('users', UserViewSet, 'users')
 router.register('ingredients', IngredientViewSet, 'ingredients')
 router.register('recipes', RecipeViewSet, 'recipes')
 router.register('tags', TagViewSet, 'tags')
+router.register('uploads', ImageUploadViewSet, 'uploads')
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_VIEWS:
+    urlpatterns += [
+        path('recipes/', RecipeListView.as_view()),
+        path('recipes/<int:pk>/', RecipeDetailView.as_view()),
+        path('tags/', TagListView.as_view()),
+        path('tags/<int:pk>/', TagDetailView.as_view()),
+        path('ingredients/', IngredientListView.as_view()),
+        path('ingredients/<int:pk>/', IngredientDetailView.as_view()),
+        path('users/subscriptions/', SubscriptionsView.as_view()),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics', metrics_view, name='metrics'),
 ]
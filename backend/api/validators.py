@@ -1,24 +1,36 @@
 from string import hexdigits
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
 from django.utils import deconstruct
+from PIL import Image, UnidentifiedImageError
 
 
 def ingredient_validator(ingredients, Ingredient):
     if not ingredients:
         raise ValidationError('Не указаны ингридиенты')
+    if not isinstance(ingredients, list):
+        raise ValidationError('Ингредиенты передаются списком.')
 
     valid_ingredients = {}
 
     for ingredient in ingredients:
-        valid_ingredients[ingredient['id']] = int(ingredient['amount'])
+        try:
+            ingredient_id = int(ingredient['id'])
+            amount = int(ingredient['amount'])
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                'Ингредиент задаётся объектом с полями id и amount.'
+            )
+        valid_ingredients[ingredient_id] = amount
 
-        if valid_ingredients[ingredient['id']] <= 0:
+        if amount <= 0:
             raise ValidationError(
                 'Количество каждого ингредиента '
                 'не может быть меньше 1. '
             )
-        if valid_ingredients[ingredient['id']] > 1000:
+        if amount > 1000:
             raise ValidationError(
                 'Вы пытаетесь добавить слишком '
                 'большое количество ингредиентов. '
@@ -26,6 +38,10 @@ def ingredient_validator(ingredients, Ingredient):
     ingredients_to_add = Ingredient.objects.filter(
         id__in=valid_ingredients.keys()
     )
+    if len(ingredients_to_add) != len(valid_ingredients):
+        raise ValidationError(
+            'Указан несуществующий ингредиент.'
+        )
 
     for ingredient in ingredients_to_add:
         valid_ingredients[ingredient.id] = (
@@ -84,3 +100,34 @@ def hex_color_validator(color):
     if len(color) == 3:
         return f'#{color[0] * 2}{color[1] * 2}{color[2] * 2}'.upper()
     return '#' + color.upper()
+
+
+def image_size_validator(size):
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Размер изображения не должен превышать '
+            f'{filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)}.'
+        )
+
+
+def image_header_validator(file):
+    """
+    Проверяет размер и разрешение изображения по заголовку файла,
+    не декодируя само изображение. Возвращает формат изображения.
+    """
+    image_size_validator(file.size)
+    position = file.tell()
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValidationError('Загруженный файл не является изображением.')
+    finally:
+        file.seek(position)
+
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            f'Слишком большое разрешение изображения: {width}x{height}.'
+        )
+    return image_format
@@ -1,33 +1,61 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from django.http.response import HttpResponse
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Q, Window
+from django.db.models.functions import RowNumber
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from djoser.views import UserViewSet as DUserViewSet
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin
 from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.status import (HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST,
-                                   HTTP_403_FORBIDDEN)
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
-
-from api.helpers import get_shoplist_ingredients
-from api.mixins import CreateDeleteViewMixin
+from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
+                                   HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN,
+                                   HTTP_409_CONFLICT, HTTP_411_LENGTH_REQUIRED)
+from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
+                                     ReadOnlyModelViewSet)
+
+from api.caching import RECIPES_RELATED, cached_response
+from api.filters import (ExistsFilter, IdFilter, QueryFiltersBackend,
+                         UserExistsFilter)
+from api.helpers import (SHOPLIST_WRITERS, aiter_chunks, get_id_list,
+                         search_recipes, write_upload_chunk)
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.mixins import CachedReadMixin, CreateDeleteViewMixin
 from api.paginators import PageLimitPagination
 from api.permissions import AdminOrReadOnly, AuthorOrReadOnly
-from api.serializers import (IngredientSerializer, RecipeSerializer,
-                             TagSerializer, UserRecipeSerializer,
-                             UserSubscribeSerializer)
-from recipes.models import Favourites, Ingredient, Recipe, ShoppingCart, Tag
+from api.renderers import (ShoplistCSVRenderer, ShoplistPDFRenderer,
+                           ShoplistTxtRenderer)
+from api.serializers import (ImageUploadSerializer, IngredientSerializer,
+                             RecipeBulkSerializer, RecipeSerializer,
+                             ShoppingListItemSerializer, TagSerializer,
+                             UserRecipeSerializer, UserSubscribeSerializer)
+from api.validators import image_header_validator
+from recipes.feed import get_feed
+from recipes.models import (AmountIngredient, Favourites, ImageUpload,
+                            Ingredient, Recipe, ShoppingCart, SimilarRecipes,
+                            Tag)
 from users.models import Subscriptions
 
 User = get_user_model()
 
+FEED_ORDERING = ('-pub_date', '-id')
+
 
 class UserViewSet(DUserViewSet, CreateDeleteViewMixin):
     pagination_class = PageLimitPagination
     permission_classes = (DjangoModelPermissions, )
     add_serializer = UserSubscribeSerializer
     link_model = Subscriptions
+    cursor_ordering = None
 
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def subscribe(self, request, id):
@@ -43,25 +71,52 @@ class UserViewSet(DUserViewSet, CreateDeleteViewMixin):
         return self.delete_relation(Q(author__id=id))
 
     @action(
-        methods=('get',), detail=False, permission_classes=(IsAuthenticated,)
+        methods=('get',),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        cursor_ordering=('-subscribed', '-subscription_id'),
     )
     def subscriptions(self, request):
-        pages = self.paginate_queryset(
-            User.objects.filter(following__user=self.request.user)
-        )
+        queryset = self.get_subscriptions_queryset()
+        pages = self.paginate_queryset(queryset)
         serializer = UserSubscribeSerializer(
-            pages,
+            queryset if pages is None else pages,
             many=True,
             context={'request': request}
         )
+        if pages is None:
+            return Response(serializer.data)
         return self.get_paginated_response(serializer.data)
 
+    def get_subscriptions_queryset(self):
+        recipes = Recipe.objects.all()
+        limit = self.request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=F('pub_date').desc(),
+                )
+            ).filter(row_number__lte=int(limit))
+
+        return (
+            User.objects.filter(following__user=self.request.user)
+            .annotate(
+                subscribed=F('following__added'),
+                subscription_id=F('following__id'),
+            )
+            .prefetch_related(Prefetch('recipes', queryset=recipes))
+            .order_by('-subscribed', '-subscription_id')
+        )
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+
+class IngredientViewSet(CachedReadMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly, )
     pagination_class = None
+    cache_prefix = 'ingredients'
 
     def get_queryset(self):
         name = self.request.query_params.get('name')
@@ -69,47 +124,92 @@ class IngredientViewSet(ReadOnlyModelViewSet):
 
         if not name:
             return queryset
+        return ingredient_index.search(name)
 
-        start_queryset = queryset.filter(name__istartswith=name)
-        start_names = (ing.name for ing in start_queryset)
-        contain_queryset = queryset.filter(name__icontains=name).exclude(
-            name__in=start_names
-        )
-        return list(start_queryset) + list(contain_queryset)
 
-
-class RecipeViewSet(ModelViewSet, CreateDeleteViewMixin):
-    queryset = Recipe.objects.select_related('author')
+class RecipeViewSet(CachedReadMixin, ModelViewSet, CreateDeleteViewMixin):
+    queryset = Recipe.objects.select_related('author').defer('search_vector')
     serializer_class = RecipeSerializer
     permission_classes = (AuthorOrReadOnly, )
     pagination_class = PageLimitPagination
     add_serializer = UserRecipeSerializer
+    cursor_ordering = ('-pub_date', '-id')
+    filter_backends = (QueryFiltersBackend, )
+    query_filters = (
+        ExistsFilter('tags', Recipe.tags.through, 'tag__slug__in'),
+        IdFilter('author'),
+        UserExistsFilter('is_favorited', Favourites),
+        UserExistsFilter('is_in_shopping_cart', ShoppingCart),
+    )
 
-    def get_queryset(self):
-        queryset = self.queryset
-        tags = self.request.query_params.getlist('tags')
-
-        if tags:
-            queryset = queryset.filter(tags__slug__in=tags).distinct()
+    def get_cache_prefix(self):
+        if self.action == 'retrieve':
+            return f'recipes:{self.kwargs["pk"]}', RECIPES_RELATED
+        if self.action == 'trending':
+            # Рейтинг пересчитывается по расписанию и сбрасывает только
+            # свою версию; изменения рецептов — общую версию списков.
+            return 'recipes:list', 'recipes:trending', RECIPES_RELATED
+        return 'recipes:list', RECIPES_RELATED
 
-        author = self.request.query_params.get('author')
-        if author:
-            queryset = queryset.filter(author=author)
+    def use_cache(self, request):
+        return request.user.is_anonymous
 
-        if self.request.user.is_anonymous:
-            return queryset
+    def get_queryset(self):
+        queryset = self.queryset.prefetch_related(
+            'tags',
+            Prefetch(
+                'in_recipe',
+                queryset=AmountIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('ingredient__name'),
+            ),
+        )
+        user = self.request.user
 
-        shopping_cart = self.request.query_params.get('is_in_shopping_cart')
-        if shopping_cart:
-            queryset = queryset.filter(
-                in_shopping_cart__user=self.request.user
+        if user.is_authenticated:
+            queryset = queryset.select_related(None).prefetch_related(
+                Prefetch(
+                    'author',
+                    queryset=User.objects.annotate(
+                        is_subscribed=Exists(Subscriptions.objects.filter(
+                            user=user, author=OuterRef('pk')
+                        ))
+                    ),
+                )
+            ).annotate(
+                is_favorited=Exists(Favourites.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
             )
 
-        favourites = self.request.query_params.get('is_favorited')
-        if favourites:
-            queryset = queryset.filter(in_favourites__user=self.request.user)
+        search = self.request.query_params.get('search')
+        if search:
+            # Курсор списка задаёт свою сортировку и отбросил бы
+            # сортировку по релевантности.
+            if (
+                self.action == 'list'
+                and self.paginator.cursor_query_param
+                in self.request.query_params
+            ):
+                raise ValidationError(
+                    {'cursor': 'Курсор нельзя использовать вместе с поиском.'}
+                )
+            queryset = search_recipes(queryset, search)
         return queryset
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'trending':
+            return queryset
+        return queryset.annotate(
+            trending_score=F('ranking__score')
+        ).filter(trending_score__isnull=False).order_by(
+            '-trending_score', '-id'
+        )
+
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def favorite(self, request, id):
         recipe = get_object_or_404(Recipe, id=id)
@@ -143,21 +243,184 @@ class RecipeViewSet(ModelViewSet, CreateDeleteViewMixin):
     @action(
         methods=('get', ),
         detail=False,
-        permission_classes=[IsAuthenticated, ]
+        permission_classes=[IsAuthenticated, ],
+        renderer_classes=(
+            ShoplistTxtRenderer,
+            ShoplistCSVRenderer,
+            ShoplistPDFRenderer,
+        ),
     )
     def download_shopping_cart(self, request):
+        """
+        Список покупок в txt, csv или pdf. txt и csv передаются потоком
+        по мере чтения строк из базы, под ASGI — асинхронным итератором;
+        pdf сначала собирается целиком в памяти.
+        """
         user = self.request.user
         if not user.shopping_cart.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        name = f'{user.username}_id{user.id}_shoplist.txt'
-        shoplist = get_shoplist_ingredients(user)
-        response = HttpResponse(
-            shoplist, content_type="text.txt; charset=utf-8"
-        )
+        renderer = request.accepted_renderer
+        name = f'{user.username}_id{user.id}_shoplist.{renderer.format}'
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        content = SHOPLIST_WRITERS[renderer.format](user)
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_chunks(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename={name}'
         return response
 
+    @action(
+        methods=('get', ),
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+    )
+    def shopping_cart_summary(self, request):
+        serializer = ShoppingListItemSerializer(
+            request.user.shopping_list.select_related('ingredient')
+            .order_by('ingredient__name'),
+            many=True,
+        )
+        return Response(serializer.data)
+
+    @action(
+        methods=('get', ),
+        detail=False,
+        cursor_ordering=('-trending_score', '-id'),
+    )
+    def trending(self, request):
+        return self.list(request)
+
+    @action(
+        methods=('get', ),
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+        cursor_ordering=None,
+    )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        queryset = self.get_queryset()
+
+        def get_results(cursor, limit):
+            if cursor is not None:
+                pub_date = parse_datetime(cursor[0])
+                if pub_date is None:
+                    raise ValueError(cursor[0])
+                cursor = pub_date, int(cursor[1])
+            ids = get_feed(request.user, cursor, limit)
+            recipes = queryset.in_bulk(ids)
+            return [
+                recipes[recipe_id] for recipe_id in ids
+                if recipe_id in recipes
+            ]
+
+        page = self.paginator.paginate_source(
+            get_results, request, FEED_ORDERING
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('get', ),
+        detail=False,
+        url_path='by-ingredients',
+        cursor_ordering=None,
+    )
+    def by_ingredients(self, request):
+        """
+        Рецепты из имеющихся ингредиентов: ingredients — что есть,
+        exclude — чего в рецепте быть не должно, min_match — сколько
+        ингредиентов должно совпасть (по умолчанию все). Фильтры списка
+        применяются к PANTRY_SEARCH_LIMIT лучшим совпадениям, чтобы
+        запрос к базе не рос с числом найденных рецептов.
+        """
+        params = request.query_params
+        include = get_id_list(params, 'ingredients')
+        if not include:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'}
+            )
+        min_match = params.get('min_match')
+        if min_match is not None and not min_match.isdigit():
+            raise ValidationError(
+                {'min_match': 'Ожидалось целое положительное число.'}
+            )
+
+        ids = recipe_ingredient_index.search(
+            include,
+            get_id_list(params, 'exclude'),
+            int(min_match) if min_match else None,
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        if ids and queryset.query.has_filters():
+            allowed = set(
+                queryset.filter(id__in=ids).values_list('id', flat=True)
+            )
+            ids = [recipe_id for recipe_id in ids if recipe_id in allowed]
+        page = self.paginate_queryset(ids)
+        if page is not None:
+            ids = page
+        recipes = queryset.in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id in ids if recipe_id in recipes],
+            many=True,
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=('get', ), detail=True)
+    def similar(self, request, pk):
+        if not pk.isdigit():
+            raise NotFound()
+        return cached_response(
+            request,
+            self.get_cache_prefix(),
+            partial(self.get_similar_response, pk),
+        )
+
+    def get_similar_response(self, pk):
+        get_object_or_404(Recipe, pk=pk)
+        neighbours = SimilarRecipes.objects.filter(recipe=pk).values_list(
+            'neighbours', flat=True
+        ).first() or []
+        recipes = Recipe.objects.in_bulk(neighbours)
+        serializer = UserRecipeSerializer(
+            [
+                recipes[recipe_id] for recipe_id in neighbours
+                if recipe_id in recipes
+            ],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    @action(
+        methods=('post', ),
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+    )
+    def bulk(self, request):
+        serializer = RecipeBulkSerializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.RECIPE_BULK_LIMIT,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        ids = [recipe.id for recipe in serializer.save()]
+        # Ответ в порядке входных рецептов, а не в сортировке модели.
+        created = self.get_queryset().in_bulk(ids)
+        return Response(
+            self.get_serializer(
+                [created[pk] for pk in ids], many=True
+            ).data,
+            status=HTTP_201_CREATED,
+        )
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         user = self.request.user
@@ -167,8 +430,90 @@ class RecipeViewSet(ModelViewSet, CreateDeleteViewMixin):
         return Response(status=HTTP_403_FORBIDDEN)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CachedReadMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly, )
     pagination_class = None
+    cache_prefix = 'tags'
+
+
+class ImageUploadViewSet(
+    CreateModelMixin, RetrieveModelMixin, GenericViewSet
+):
+    """
+    Загрузка изображения рецепта по частям.
+
+    POST создаёт загрузку с заявленным размером, PATCH дописывает часть
+    тела запроса со смещения из заголовка Upload-Offset, GET возвращает
+    текущее смещение для возобновления. Готовая загрузка передаётся
+    в рецепт полем image_upload.
+    """
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthenticated, )
+    http_method_names = ('get', 'post', 'patch', 'delete')
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        upload = serializer.save(user=self.request.user)
+        upload.path.parent.mkdir(parents=True, exist_ok=True)
+        upload.path.touch()
+
+    def get_chunk_length(self, request):
+        """Длина части из Content-Length или None, если её нет."""
+        length = request.headers.get('Content-Length')
+        if not length:
+            return None
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ValidationError(
+                'Content-Length должен быть неотрицательным целым числом.'
+            )
+        if length > settings.IMAGE_UPLOAD_CHUNK_SIZE:
+            raise ValidationError(
+                'Размер части не должен превышать '
+                f'{settings.IMAGE_UPLOAD_CHUNK_SIZE} байт.'
+            )
+        return length
+
+    def partial_update(self, request, *args, **kwargs):
+        length = self.get_chunk_length(request)
+        if length is None:
+            return Response(
+                {'error': 'Не передан заголовок Content-Length.'},
+                status=HTTP_411_LENGTH_REQUIRED,
+            )
+
+        with transaction.atomic():
+            upload = get_object_or_404(
+                self.get_queryset().select_for_update(), pk=kwargs['pk']
+            )
+            if request.headers.get('Upload-Offset') != str(upload.offset):
+                return Response(
+                    self.get_serializer(upload).data,
+                    status=HTTP_409_CONFLICT,
+                )
+            if upload.offset + length > upload.size:
+                raise ValidationError('Часть выходит за пределы файла.')
+
+            upload.offset += write_upload_chunk(upload, request.stream, length)
+            if upload.offset == upload.size:
+                with upload.path.open('rb') as file:
+                    try:
+                        upload.image_format = image_header_validator(
+                            File(file)
+                        )
+                    except DjangoValidationError as error:
+                        raise ValidationError(error.messages)
+            upload.save(update_fields=('offset', 'image_format'))
+        return Response(self.get_serializer(upload).data)
+
+    def destroy(self, request, *args, **kwargs):
+        self.get_object().delete()
+        return Response(status=HTTP_204_NO_CONTENT)
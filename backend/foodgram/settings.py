@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -27,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -36,6 +38,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+if not METRICS_ENABLED:
+    MIDDLEWARE.remove('api.middleware.MetricsMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -74,9 +83,20 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('CACHE_LOCATION', default='foodgram'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -135,6 +155,51 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+
+IMAGE_UPLOAD_ROOT = config('IMAGE_UPLOAD_ROOT', default=BASE_DIR / 'uploads')
+
+IMAGE_UPLOAD_MAX_SIZE = config(
+    'IMAGE_UPLOAD_MAX_SIZE', default=20 * 1024 * 1024, cast=int
+)
+
+IMAGE_UPLOAD_MAX_PIXELS = config(
+    'IMAGE_UPLOAD_MAX_PIXELS', default=40_000_000, cast=int
+)
+
+IMAGE_UPLOAD_CHUNK_SIZE = config(
+    'IMAGE_UPLOAD_CHUNK_SIZE', default=1024 * 1024, cast=int
+)
+
+RECIPE_BULK_LIMIT = config('RECIPE_BULK_LIMIT', default=50, cast=int)
+
+TRENDING_HALF_LIFE_HOURS = config(
+    'TRENDING_HALF_LIFE_HOURS', default=72, cast=float
+)
+
+TRENDING_WINDOW_HOURS = config('TRENDING_WINDOW_HOURS', default=336, cast=int)
+
+TRENDING_LAG_SECONDS = config('TRENDING_LAG_SECONDS', default=300, cast=int)
+
+SIMILAR_RECIPES_COUNT = config('SIMILAR_RECIPES_COUNT', default=10, cast=int)
+
+FEED_WORKERS = config('FEED_WORKERS', default=1, cast=int)
+
+FEED_FANOUT_LIMIT = config('FEED_FANOUT_LIMIT', default=1000, cast=int)
+
+FEED_BACKFILL = config('FEED_BACKFILL', default=20, cast=int)
+
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+AUTH_TOKEN_CACHE_TIMEOUT = config(
+    'AUTH_TOKEN_CACHE_TIMEOUT', default=60, cast=int
+)
+
+SHOPLIST_PDF_FONT = config(
+    'SHOPLIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CSRF_TRUSTED_ORIGINS = config(
@@ -1,10 +1,14 @@
 from django.contrib.admin import ModelAdmin, TabularInline, register, site
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db.models import Q
 from django.utils.safestring import mark_safe
 
+from api.helpers import (get_recipe_amounts, search_recipes,
+                         update_recipe_shopping_lists)
 from recipes.forms import AmountIngredientFormSet, TagForm
 from recipes.models import (AmountIngredient, Favourites, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+                            RecipeRanking, ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscriptions
 
 EMPTY_VALUE_DISPLAY = '-empty-'
@@ -58,7 +62,8 @@ class RecipeAdmin(ModelAdmin):
         'name',
         'author',
         'get_image',
-        'count_favourites',
+        'favourites_count',
+        'in_carts_count',
     )
     fields = (
         (
@@ -77,9 +82,8 @@ class RecipeAdmin(ModelAdmin):
         ),
     )
     search_fields = (
-        'name',
-        'author__username',
-        'tags__name',
+        '=author__username',
+        '^tags__name',
     )
     list_filter = (
         'name',
@@ -90,16 +94,33 @@ class RecipeAdmin(ModelAdmin):
     inlines = (IngredientInline, )
     empty_value_display = EMPTY_VALUE_DISPLAY
 
+    def save_related(self, request, form, formsets, change):
+        old_amounts = get_recipe_amounts(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        update_recipe_shopping_lists(form.instance, old_amounts)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Название ищется по полнотекстовому и триграммному индексам,
+        автор и тэги — точным совпадением и по началу строки.
+        """
+        results, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        if not search_term:
+            return results, may_have_duplicates
+        found = search_recipes(queryset, search_term).order_by()
+        return queryset.filter(
+            Q(id__in=results.values('id')) | Q(id__in=found.values('id'))
+        ), False
+
     def get_image(self, obj):
-        return mark_safe(f'<img src={obj.image.url} width="80" height="30" ')
+        thumbnail = obj.image_variants.get('thumbnail', {}).get('jpeg')
+        url = default_storage.url(thumbnail) if thumbnail else obj.image.url
+        return mark_safe(f'<img src={url} width="80" height="30" ')
 
     get_image.short_description = 'Изображение'
 
-    def count_favourites(self, obj):
-        return obj.in_favourites.count()
-
-    count_favourites.short_description = 'В избранном'
-
 
 @register(Favourites)
 class FavouriteAdmin(ModelAdmin):
@@ -127,6 +148,35 @@ class ShoppingCartAdmin(ModelAdmin):
     )
 
 
+@register(ShoppingListItem)
+class ShoppingListItemAdmin(ModelAdmin):
+    list_display = (
+        'user',
+        'ingredient',
+        'total_amount',
+    )
+    search_fields = (
+        'user__username',
+    )
+
+
+@register(RecipeRanking)
+class RecipeRankingAdmin(ModelAdmin):
+    list_display = (
+        'recipe',
+        'score',
+    )
+    list_select_related = (
+        'recipe',
+    )
+    search_fields = (
+        'recipe__name',
+    )
+    ordering = (
+        '-score',
+    )
+
+
 @register(Subscriptions)
 class SubscriptionsAdmin(ModelAdmin):
     list_display = (
@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.db import close_old_connections, transaction
+
+
+class BackgroundExecutor:
+    """
+    Запускает задачи после фиксации транзакции в пуле из workers
+    потоков. При workers, равном 0, задача выполняется сразу после
+    фиксации в текущем потоке.
+    """
+
+    def __init__(self, workers, name):
+        self.executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+            if workers
+            else None
+        )
+
+    def run(self, func, *args):
+        try:
+            func(*args)
+        finally:
+            close_old_connections()
+
+    def schedule(self, func, *args):
+        if self.executor is None:
+            transaction.on_commit(partial(func, *args))
+            return
+        transaction.on_commit(
+            partial(self.executor.submit, self.run, func, *args)
+        )
@@ -0,0 +1,139 @@
+from heapq import merge
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.background import BackgroundExecutor
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscriptions
+
+BATCH_SIZE = 1000
+
+background = BackgroundExecutor(settings.FEED_WORKERS, 'recipe-feed')
+
+
+def fan_out_recipes(recipe_ids):
+    """
+    Добавляет рецепты в ленты подписчиков их авторов.
+    Рецепты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT,
+    не раскладываются: они добавляются в ленту при чтении.
+    """
+    recipes = Recipe.objects.filter(
+        id__in=recipe_ids,
+        author__followers_count__lte=settings.FEED_FANOUT_LIMIT,
+    ).values_list('id', 'author', 'pub_date')
+    for recipe_id, author_id, pub_date in recipes:
+        followers = Subscriptions.objects.filter(
+            author=author_id
+        ).values_list('user', flat=True)
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                          pub_date=pub_date)
+                for user_id in followers.iterator(chunk_size=BATCH_SIZE)
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def schedule_fan_out(recipe_ids):
+    background.schedule(fan_out_recipes, list(recipe_ids))
+
+
+def add_author_to_feed(user_id, author_id):
+    """Добавляет в ленту подписчика последние рецепты автора."""
+    recipes = Recipe.objects.filter(
+        author=author_id,
+        author__followers_count__lte=settings.FEED_FANOUT_LIMIT,
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      pub_date=pub_date)
+            for recipe_id, pub_date in recipes[:settings.FEED_BACKFILL]
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user=user_id, recipe__author=author_id).delete()
+
+
+def rebuild_feeds():
+    """
+    Заново собирает ленты всех пользователей из подписок
+    и последних FEED_BACKFILL рецептов каждого автора.
+    Возвращает число записей в лентах.
+    """
+    authors = Subscriptions.objects.filter(
+        author__followers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).values_list('author', flat=True).distinct().order_by('author')
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        for author_id in authors.iterator(chunk_size=BATCH_SIZE):
+            recipes = list(
+                Recipe.objects.filter(author=author_id)
+                .order_by('-pub_date', '-id')
+                .values_list('id', 'pub_date')[:settings.FEED_BACKFILL]
+            )
+            followers = Subscriptions.objects.filter(
+                author=author_id
+            ).values_list('user', flat=True)
+            FeedEntry.objects.bulk_create(
+                (
+                    FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                              pub_date=pub_date)
+                    for user_id in followers
+                    for recipe_id, pub_date in recipes
+                ),
+                batch_size=BATCH_SIZE,
+            )
+    return FeedEntry.objects.count()
+
+
+def get_feed(user, cursor, limit):
+    """
+    id рецептов ленты пользователя по убыванию даты публикации.
+
+    Разложенные записи читаются из ленты по индексу, рецепты авторов
+    с большим числом подписчиков — напрямую и сливаются с ними,
+    так что стоимость чтения не зависит от числа подписок.
+    cursor — пара (дата публикации, id) последнего прочитанного
+    рецепта или None.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    popular = Recipe.objects.filter(
+        author__in=Subscriptions.objects.filter(
+            user=user,
+            author__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values('author')
+    )
+    if cursor is not None:
+        pub_date, recipe_id = cursor
+        entries = entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe__lt=recipe_id),
+            pub_date__lte=pub_date,
+        )
+        popular = popular.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=recipe_id),
+            pub_date__lte=pub_date,
+        )
+
+    recipes = merge(
+        entries.order_by('-pub_date', '-recipe')
+        .values_list('pub_date', 'recipe')[:limit],
+        popular.order_by('-pub_date', '-id')
+        .values_list('pub_date', 'id')[:limit],
+        reverse=True,
+    )
+    page = []
+    for _, recipe_id in recipes:
+        if len(page) == limit:
+            break
+        if recipe_id not in page:
+            page.append(recipe_id)
+    return page
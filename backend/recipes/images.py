@@ -0,0 +1,83 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from api.caching import invalidate_recipe
+from recipes.background import BackgroundExecutor
+
+IMAGE_SIZE = 500, 500
+IMAGE_VARIANTS = {
+    'detail': (1000, 1000),
+    'card': (500, 500),
+    'thumbnail': (100, 100),
+}
+IMAGE_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+IMAGE_QUALITY = 85
+
+background = BackgroundExecutor(settings.IMAGE_WORKERS, 'recipe-images')
+
+
+def save_variant(image, name, extension):
+    buffer = BytesIO()
+    image.save(buffer, IMAGE_FORMATS[extension], quality=IMAGE_QUALITY)
+    return default_storage.save(
+        f'{name}.{extension}', ContentFile(buffer.getvalue())
+    )
+
+
+def process_recipe_image(recipe_id, image_name):
+    """
+    Готовит уменьшенные копии изображения рецепта
+    и уменьшает сам оригинал до IMAGE_SIZE.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    try:
+        recipe = Recipe.objects.only('image', 'image_variants').get(
+            pk=recipe_id, image=image_name
+        )
+    except Recipe.DoesNotExist:
+        return
+
+    with default_storage.open(image_name) as file:
+        image = Image.open(file)
+        image_format = image.format
+        image.draft('RGB', max(IMAGE_VARIANTS.values()))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    stem = PurePosixPath(image_name)
+    base_name = f'{stem.parent}/variants/{stem.stem}'
+    variants = {}
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size)
+        variants[variant] = {
+            extension: save_variant(
+                resized, f'{base_name}_{variant}', extension
+            )
+            for extension in IMAGE_FORMATS
+        }
+
+    image.thumbnail(IMAGE_SIZE)
+    with default_storage.open(image_name, 'wb') as file:
+        image.save(file, image_format)
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_variants=variants
+    )
+    stale = recipe.image_variants if updated else variants
+    for paths in stale.values():
+        for path in paths.values():
+            default_storage.delete(path)
+    invalidate_recipe(recipe_id)
+
+
+def schedule_image_processing(recipe):
+    background.schedule(process_recipe_image, recipe.pk, recipe.image.name)
@@ -0,0 +1,304 @@
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from statistics import mean, quantiles
+from time import perf_counter
+from typing import Any
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe, ShoppingCart, Tag
+from users.models import Subscriptions
+
+REQUESTS = 50
+WARMUP = 5
+CONCURRENCY = 1
+TIMEOUT = 60
+# Списки запрашиваются страницами, как их запрашивает фронтенд.
+RECIPE_LIST = '/api/recipes/?limit=6'
+# Кэш на время замера без кэша: общий кэш (Redis) не очищается,
+# запросы просто не находят в нём данных.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def get_endpoints(sample_size):
+    """
+    Набор запросов к основным эндпоинтам: имя, адреса и признак
+    запроса от имени авторизованного пользователя.
+    """
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    author = (
+        Recipe.objects.values('author').annotate(count=Count('id'))
+        .order_by('-count').values_list('author', flat=True).first()
+    )
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True)[:1000])
+    recipes = random.sample(recipe_ids, min(sample_size, len(recipe_ids)))
+    tag_query = '&'.join(f'tags={tag}' for tag in tags)
+    return (
+        ('recipes.list', [RECIPE_LIST], False),
+        ('recipes.list.auth', [RECIPE_LIST], True),
+        ('recipes.list.tags', [f'{RECIPE_LIST}&{tag_query}'], True),
+        ('recipes.list.author', [f'{RECIPE_LIST}&author={author}'], True),
+        ('recipes.list.favorited', [f'{RECIPE_LIST}&is_favorited=1'], True),
+        ('recipes.list.cart', [f'{RECIPE_LIST}&is_in_shopping_cart=1'], True),
+        ('recipes.list.search', [f'{RECIPE_LIST}&search=рецепт'], True),
+        ('recipes.feed', ['/api/recipes/feed/'], True),
+        ('recipes.detail', [f'/api/recipes/{pk}/' for pk in recipes], True),
+        (
+            'recipes.similar',
+            [f'/api/recipes/{pk}/similar/' for pk in recipes],
+            False,
+        ),
+        (
+            'users.subscriptions',
+            ['/api/users/subscriptions/?limit=6&recipes_limit=3'],
+            True,
+        ),
+        ('ingredients.search', ['/api/ingredients/?name=со'], False),
+        (
+            'recipes.download_shopping_cart',
+            ['/api/recipes/download_shopping_cart/'],
+            True,
+        ),
+    )
+
+
+def get_benchmark_user(user_id):
+    if user_id is not None:
+        return Token.objects.get_or_create(user_id=user_id)[0]
+    user = (
+        ShoppingCart.objects.values('user').annotate(count=Count('id'))
+        .order_by('-count').values_list('user', flat=True).first()
+    ) or Subscriptions.objects.values_list('user', flat=True).first()
+    if user is None:
+        raise CommandError(
+            'Нет пользователей с корзиной покупок или подписками. '
+            'Создайте данные командой generate_data.'
+        )
+    return Token.objects.get_or_create(user_id=user)[0]
+
+
+def run_request(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        start = perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = perf_counter() - start
+    return elapsed, len(queries), response.status_code, size
+
+
+class HttpClient:
+    """
+    Клиент для запросов к запущенному серверу. У каждого потока своя
+    сессия requests, соединения с сервером переиспользуются.
+    """
+
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Authorization': f'Token {token}'} if token else {}
+        self.local = threading.local()
+
+    def get(self, url):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session.get(
+            self.base_url + url, headers=self.headers, timeout=TIMEOUT
+        )
+
+
+def run_http_request(client, url):
+    """Запрос по HTTP: число SQL-запросов сервера здесь не видно."""
+    start = perf_counter()
+    response = client.get(url)
+    size = len(response.content)
+    elapsed = perf_counter() - start
+    return elapsed, None, response.status_code, size
+
+
+def summarize(timings, query_counts, statuses, sizes, duration=None):
+    """
+    Показатели серии запросов. duration — общее время серии, при
+    параллельных запросах оно меньше суммы задержек.
+    """
+    percentiles = quantiles(timings, n=100, method='inclusive')
+    total = duration or sum(timings)
+    result = {
+        'requests': len(timings),
+        'p50_ms': round(percentiles[49] * 1000, 2),
+        'p95_ms': round(percentiles[94] * 1000, 2),
+        'p99_ms': round(percentiles[98] * 1000, 2),
+        'mean_ms': round(mean(timings) * 1000, 2),
+        'throughput_rps': round(len(timings) / total, 1) if total else None,
+    }
+    query_counts = [count for count in query_counts if count is not None]
+    if query_counts:
+        result['queries_mean'] = round(mean(query_counts), 1)
+        result['queries_max'] = max(query_counts)
+    result['bytes_mean'] = round(mean(sizes))
+    result['statuses'] = {
+        str(status): statuses.count(status) for status in set(statuses)
+    }
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет задержки, пропускную способность и число SQL-запросов '
+        'основных эндпоинтов API, вызывая их в процессе через тестовый '
+        'клиент Django или по HTTP у запущенного сервера (--base-url), '
+        'в том числе параллельно (--concurrency). Результат выводится '
+        'в формате JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=REQUESTS)
+        parser.add_argument('--warmup', type=int, default=WARMUP)
+        parser.add_argument(
+            '--user', type=int, default=None,
+            help='id пользователя для авторизованных запросов.',
+        )
+        parser.add_argument(
+            '--only', nargs='*', default=None,
+            help='Имена эндпоинтов, которые нужно измерить.',
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Выполнять запросы без кэша, не очищая общий кэш. '
+                 'Только без --base-url.',
+        )
+        parser.add_argument('--output', help='Файл для результата.')
+        parser.add_argument(
+            '--compare', help='Файл с прошлым результатом для сравнения.',
+        )
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера, например http://localhost:8002. '
+                 'Без него запросы выполняются в процессе.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=CONCURRENCY,
+            help='Число одновременных запросов, только с --base-url.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if options['requests'] < 2:
+            raise CommandError('Нужно не меньше двух запросов.')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency должно быть не меньше 1.')
+        if options['concurrency'] > 1 and not options['base_url']:
+            raise CommandError('--concurrency работает только с --base-url.')
+        if options['no_cache'] and options['base_url']:
+            raise CommandError(
+                '--no-cache работает только без --base-url: кэш '
+                'запущенного сервера из команды не отключить.'
+            )
+        random.seed(options['seed'])
+        setup_test_environment()
+        try:
+            with (
+                override_settings(CACHES=NO_CACHE)
+                if options['no_cache'] else nullcontext()
+            ):
+                self.run_benchmark(options)
+        finally:
+            teardown_test_environment()
+
+    def run_benchmark(self, options):
+        token = get_benchmark_user(options['user'])
+        if options['base_url']:
+            anonymous = HttpClient(options['base_url'])
+            authorized = HttpClient(options['base_url'], token.key)
+            run = run_http_request
+        else:
+            anonymous = Client()
+            authorized = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+            run = run_request
+
+        results = {}
+        for name, urls, auth in get_endpoints(options['requests']):
+            if options['only'] and name not in options['only']:
+                continue
+            client = authorized if auth else anonymous
+
+            def measure(number):
+                return run(client, urls[number % len(urls)])
+
+            try:
+                for number in range(options['warmup']):
+                    run(client, urls[number % len(urls)])
+                start = perf_counter()
+                if options['concurrency'] == 1:
+                    measurements = [
+                        measure(number)
+                        for number in range(options['requests'])
+                    ]
+                else:
+                    with ThreadPoolExecutor(options['concurrency']) as pool:
+                        measurements = list(
+                            pool.map(measure, range(options['requests']))
+                        )
+                duration = perf_counter() - start
+            except requests.RequestException as error:
+                raise CommandError(
+                    f'Сервер {options["base_url"]} недоступен: {error}'
+                )
+            results[name] = summarize(
+                *map(list, zip(*measurements)), duration=duration
+            )
+            message = (
+                f'{name}: p50 {results[name]["p50_ms"]} мс, '
+                f'p95 {results[name]["p95_ms"]} мс, '
+                f'{results[name]["throughput_rps"]} запросов/с'
+            )
+            if 'queries_mean' in results[name]:
+                message += f', запросов к БД {results[name]["queries_mean"]}'
+            self.stderr.write(message)
+
+        report = {
+            'user': token.user_id,
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'endpoints': results,
+        }
+        if options['compare']:
+            report['compare'] = self.compare(options['compare'], results)
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def compare(self, file_name, results):
+        """Отношение новых показателей к прошлым: меньше 1 — быстрее."""
+        with open(file_name, encoding='utf-8') as file:
+            baseline = json.load(file)['endpoints']
+        return {
+            name: {
+                key: round(result[key] / baseline[name][key], 3)
+                for key in (
+                    'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps',
+                    'queries_mean',
+                )
+                if baseline[name].get(key) and key in result
+            }
+            for name, result in results.items()
+            if name in baseline
+        }
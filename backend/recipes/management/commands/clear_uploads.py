@@ -0,0 +1,29 @@
+from datetime import timedelta
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = 'Удаляет незавершённые и неиспользованные загрузки изображений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Возраст загрузки в часах, после которого она удаляется.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        uploads = ImageUpload.objects.filter(
+            created__lt=timezone.now() - timedelta(hours=options['hours'])
+        )
+        count = 0
+        for upload in uploads.iterator():
+            upload.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {count}'))
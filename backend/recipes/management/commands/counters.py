@@ -0,0 +1,64 @@
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from api.counters import count_related
+from recipes.models import Favourites, Recipe, ShoppingCart
+from users.models import Subscriptions
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favourites_count', Favourites, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscriptions, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного, корзин, рецептов и подписчиков '
+        'или сверяет их с фактическими данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить счётчики, не изменяя их.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if options['check']:
+            return self.check_counters()
+
+        with transaction.atomic():
+            for model, field, related_model, related_field in COUNTERS:
+                live = count_related(related_model, related_field)
+                updated = model.objects.exclude(**{field: live}).update(
+                    **{field: live}
+                )
+                self.stdout.write(
+                    f'{model.__name__}.{field}: исправлено {updated}'
+                )
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
+
+    def check_counters(self):
+        mismatches = 0
+        for model, field, related_model, related_field in COUNTERS:
+            wrong = model.objects.annotate(
+                live=count_related(related_model, related_field)
+            ).exclude(**{field: F('live')})
+            for pk, stored, live in wrong.values_list('pk', field, 'live'):
+                self.stdout.write(
+                    f'{model.__name__} id={pk} {field}: '
+                    f'сохранено {stored}, фактически {live}'
+                )
+                mismatches += 1
+        if mismatches:
+            raise CommandError(f'Расхождений: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('Счётчики совпадают.'))
@@ -0,0 +1,351 @@
+import json
+import re
+from typing import Any
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+
+from recipes.management.commands.benchmark import (NO_CACHE,
+                                                   get_benchmark_user,
+                                                   get_endpoints)
+
+MIN_ROWS = 1000
+MAX_ROWS = 100_000
+ESTIMATE_FACTOR = 10
+SCAN_NODES = frozenset((
+    'Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan',
+))
+CURSOR_PREFIX = re.compile(r'^DECLARE\s+\S+\s+.*?CURSOR\s+.*?FOR\s+', re.S)
+EQUALITY = re.compile(r'(?:\w+\.)?(\w+) = ')
+RANGE = re.compile(r'(?:\w+\.)?(\w+) (?:<|>|<=|>=) ')
+SORT_KEY = re.compile(r'(?:(\w+)\.)?(\w+)( DESC)?')
+
+
+def get_select(sql):
+    """Текст SELECT из выполненного запроса или None для прочих."""
+    sql = CURSOR_PREFIX.sub('', sql.strip())
+    if not sql.upper().startswith(('SELECT', 'WITH')):
+        return None
+    return sql
+
+
+def walk(node, limited=False):
+    """
+    Узлы плана и признак того, что узел выполняется под Limit
+    и мог остановиться раньше, чем вернул все строки.
+    """
+    yield node, limited
+    limited = limited or node['Node Type'] == 'Limit'
+    for child in node.get('Plans', ()):
+        yield from walk(child, limited)
+
+
+def get_scanned_rows(node):
+    loops = node.get('Actual Loops', 1)
+    return (
+        node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)
+    ) * loops
+
+
+def get_conditions(node):
+    return ' AND '.join(
+        node[key] for key in ('Index Cond', 'Recheck Cond', 'Filter')
+        if key in node
+    )
+
+
+def unique(items):
+    return list(dict.fromkeys(items))
+
+
+def get_model(table):
+    for model in apps.get_models(include_auto_created=True):
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def get_existing_index(table, columns):
+    """Имя индекса, первые столбцы которого совпадают с columns."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for name, constraint in constraints.items():
+        if constraint['index'] or constraint['unique']:
+            if constraint['columns'][:len(columns)] == columns:
+                return name
+    return None
+
+
+def propose_index(table, columns, descending=()):
+    """
+    Индекс по столбцам columns таблицы table: описание для Meta.indexes
+    модели и SQL. Если такой индекс уже есть, вместо него — имя
+    существующего.
+    """
+    columns = unique(columns)
+    if not columns:
+        return None
+    existing = get_existing_index(table, columns)
+    if existing:
+        return {'table': table, 'columns': columns, 'existing': existing}
+
+    model = get_model(table)
+    fields = (
+        {field.column: field.name for field in model._meta.fields}
+        if model else {}
+    )
+    names = [
+        ('-' if column in descending else '') + fields.get(column, column)
+        for column in columns
+    ]
+    index_name = '_'.join(
+        [model._meta.model_name if model else table]
+        + [name.lstrip('-') for name in names]
+    )[:26] + '_idx'
+    sql_columns = ', '.join(
+        column + (' DESC' if column in descending else '')
+        for column in columns
+    )
+    proposal = {
+        'table': table,
+        'columns': columns,
+        'sql': (
+            f'CREATE INDEX CONCURRENTLY {index_name} '
+            f'ON {table} ({sql_columns});'
+        ),
+    }
+    if model and not model._meta.auto_created:
+        proposal['model'] = model._meta.label
+        proposal['index'] = (
+            f'Index(fields={tuple(names)!r}, name={index_name!r})'
+        )
+    return proposal
+
+
+def check_scan(node, min_rows):
+    scanned = get_scanned_rows(node)
+    if node['Node Type'] != 'Seq Scan' or scanned < min_rows:
+        return None
+    conditions = get_conditions(node)
+    return {
+        'type': 'seq_scan',
+        'relation': node['Relation Name'],
+        'rows': scanned,
+        'condition': conditions or None,
+        'proposal': propose_index(
+            node['Relation Name'],
+            EQUALITY.findall(conditions) + RANGE.findall(conditions),
+        ),
+    }
+
+
+def check_sort(node, min_rows):
+    """
+    Сортировка большого числа строк или на диске. Если сортируются
+    строки одной таблицы, предлагается индекс из столбцов равенства
+    её условия и ключей сортировки.
+    """
+    rows = sum(
+        child.get('Actual Rows', 0) * child.get('Actual Loops', 1)
+        for child in node.get('Plans', ())
+    )
+    on_disk = node.get('Sort Space Type') == 'Disk'
+    if rows < min_rows and not on_disk:
+        return None
+    finding = {
+        'type': 'sort',
+        'rows': rows,
+        'sort_key': node.get('Sort Key', []),
+        'on_disk': on_disk,
+        'proposal': None,
+    }
+    scans = [
+        child for child, _ in walk(node)
+        if child['Node Type'] in SCAN_NODES and 'Relation Name' in child
+    ]
+    if len(scans) != 1:
+        return finding
+    scan = scans[0]
+    aliases = {scan['Relation Name'], scan.get('Alias')}
+    keys = [SORT_KEY.fullmatch(key) for key in finding['sort_key']]
+    if not all(
+        key and (key[1] is None or key[1] in aliases) for key in keys
+    ):
+        return finding
+    finding['relation'] = scan['Relation Name']
+    finding['proposal'] = propose_index(
+        scan['Relation Name'],
+        EQUALITY.findall(get_conditions(scan)) + [key[2] for key in keys],
+        descending={key[2] for key in keys if key[3]},
+    )
+    return finding
+
+
+def check_estimate(node, limited, min_rows, max_rows):
+    """
+    Оценка числа строк, далёкая от фактической или слишком большая.
+    Под Limit узел может вернуть меньше оценки, это не ошибка.
+    """
+    estimated = node['Plan Rows']
+    actual = node.get('Actual Rows', 0)
+    if limited:
+        estimated = min(estimated, actual)
+    finding = {
+        'node': node['Node Type'],
+        'relation': node.get('Relation Name'),
+        'estimated': estimated,
+        'actual': actual,
+    }
+    if estimated >= max_rows:
+        return {'type': 'large_estimate', **finding}
+    low, high = sorted((estimated, actual))
+    if high >= min_rows and high > ESTIMATE_FACTOR * max(low, 1):
+        return {'type': 'misestimate', **finding}
+    return None
+
+
+def analyze_plan(plan, min_rows, max_rows):
+    findings = []
+    for node, limited in walk(plan):
+        if node['Node Type'] in SCAN_NODES and 'Relation Name' in node:
+            findings.append(check_scan(node, min_rows))
+        if node['Node Type'] in ('Sort', 'Incremental Sort'):
+            findings.append(check_sort(node, min_rows))
+        findings.append(check_estimate(node, limited, min_rows, max_rows))
+    return [finding for finding in findings if finding]
+
+
+def explain(sql):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql)
+        result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет основные эндпоинты API, повторяет их SQL-запросы '
+        'с EXPLAIN (ANALYZE, BUFFERS) и отмечает последовательные '
+        'просмотры, сортировки и неверные оценки числа строк, предлагая '
+        'индексы. Результат выводится в формате JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, default=None,
+            help='id пользователя для авторизованных запросов.',
+        )
+        parser.add_argument(
+            '--only', nargs='*', default=None,
+            help='Имена эндпоинтов, которые нужно проверить.',
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=MIN_ROWS,
+            help='Сколько строк должно обрабатываться узлом плана, '
+                 'чтобы он считался проблемным.',
+        )
+        parser.add_argument(
+            '--max-rows', type=int, default=MAX_ROWS,
+            help='Оценка числа строк, которая считается слишком большой.',
+        )
+        parser.add_argument('--output', help='Файл для результата.')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Завершиться с ошибкой, если предложены новые индексы.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if connection.vendor != 'postgresql':
+            raise CommandError('Команда работает только с PostgreSQL.')
+        setup_test_environment()
+        try:
+            # Без кэша каждый эндпоинт выполняет свои запросы,
+            # а общий кэш остаётся нетронутым.
+            with override_settings(CACHES=NO_CACHE), transaction.atomic():
+                report = self.run_explain(options)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+        if options['check'] and report['proposals']:
+            raise CommandError(
+                f'Предложено индексов: {len(report["proposals"])}.'
+            )
+
+    def run_explain(self, options):
+        token = get_benchmark_user(options['user'])
+        anonymous = Client()
+        authorized = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        endpoints, queries, proposals = {}, [], {}
+        for name, urls, auth in get_endpoints(1):
+            if options['only'] and name not in options['only']:
+                continue
+            client = authorized if auth else anonymous
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(urls[0])
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+
+            selects = unique(filter(None, (
+                get_select(query['sql']) for query in captured
+            )))
+            endpoints[name] = {
+                'url': urls[0],
+                'status': response.status_code,
+                'queries': len(captured),
+                'explained': len(selects),
+            }
+            for sql in selects:
+                try:
+                    result = explain(sql)
+                except DatabaseError as error:
+                    queries.append({
+                        'endpoint': name, 'sql': sql, 'error': str(error),
+                    })
+                    continue
+                findings = analyze_plan(
+                    result['Plan'], options['min_rows'], options['max_rows']
+                )
+                for finding in findings:
+                    proposal = finding.get('proposal')
+                    if proposal and 'sql' in proposal:
+                        proposals[proposal['sql']] = proposal
+                if findings:
+                    queries.append({
+                        'endpoint': name,
+                        'sql': sql,
+                        'planning_ms': result['Planning Time'],
+                        'execution_ms': result['Execution Time'],
+                        'shared_hit_blocks': result['Plan'].get(
+                            'Shared Hit Blocks'
+                        ),
+                        'shared_read_blocks': result['Plan'].get(
+                            'Shared Read Blocks'
+                        ),
+                        'findings': findings,
+                    })
+            self.stderr.write(
+                f'{name}: запросов {len(selects)}, с замечаниями '
+                f'{sum(query["endpoint"] == name for query in queries)}'
+            )
+
+        return {
+            'user': token.user_id,
+            'endpoints': endpoints,
+            'queries': queries,
+            'proposals': list(proposals.values()),
+        }
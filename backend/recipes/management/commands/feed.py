@@ -0,0 +1,18 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново собирает ленты рецептов подписок всех пользователей. '
+        'Нужна после массовой загрузки подписок или рецептов в обход API.'
+    )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        entries = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {entries}.'
+        ))
@@ -0,0 +1,261 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+from typing import Any
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Value
+from django.db.models.functions import Mod, Now
+from PIL import Image
+
+from api.caching import bump_cache_version
+from recipes.models import (AmountIngredient, Favourites, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+IMAGE_NAME = 'recipe_images/synthetic.jpg'
+PASSWORD = 'synthetic-password'
+ZIPF_EXPONENT = 1.1
+MINUTES_IN_YEAR = 365 * 24 * 60
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """
+    Накопленные веса распределения Ципфа: первые элементы
+    выбираются намного чаще последних.
+    """
+    return list(accumulate(1 / (rank ** exponent)
+                           for rank in range(1, count + 1)))
+
+
+def sample_unique(population, cum_weights, count):
+    if count * 2 >= len(population):
+        return random.sample(population, min(count, len(population)))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(random.choices(
+            population, cum_weights=cum_weights, k=count - len(chosen)
+        ))
+    return list(chosen)
+
+
+def skewed_count(mean, maximum):
+    return max(min(int(random.paretovariate(2) * mean / 2), maximum), 0)
+
+
+def spread_dates(model, ids, field):
+    """Разносит даты по последнему году, чтобы они не совпадали."""
+    if not ids:
+        return
+    model.objects.filter(
+        id__range=(min(ids), max(ids))
+    ).update(**{field: Now() - ExpressionWrapper(
+        Mod(F('id') * 7919, MINUTES_IN_YEAR) * Value(timedelta(minutes=1)),
+        output_field=DurationField(),
+    )})
+
+
+def get_placeholder_image():
+    if not default_storage.exists(IMAGE_NAME):
+        buffer = BytesIO()
+        Image.new('RGB', (500, 500), 'orange').save(buffer, 'JPEG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+    return IMAGE_NAME
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетические данные: пользователей, рецепты с тэгами '
+        'и ингредиентами, избранное, корзины и подписки '
+        'с неравномерным распределением популярности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument(
+            '--favourites', type=int, default=20,
+            help='Среднее количество избранных рецептов на пользователя.',
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Среднее количество рецептов в корзине пользователя.',
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее количество подписок пользователя.',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        random.seed(options['seed'])
+        self.batch_size = options['batch_size']
+        self.run = uuid4().hex[:6]
+
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            tags = self.create_tags(options['tags'])
+            ingredients = self.create_ingredients(options['ingredients'])
+            recipes = self.create_recipes(
+                options['recipes'], users, tags, ingredients
+            )
+            self.create_links(
+                Favourites, options['favourites'], users, recipes
+            )
+            self.create_links(ShoppingCart, options['carts'], users, recipes)
+            self.create_subscriptions(options['subscriptions'], users)
+
+        call_command('shopping_lists', stdout=self.stdout)
+        call_command('counters', stdout=self.stdout)
+        call_command('feed', stdout=self.stdout)
+        bump_cache_version('ingredients')
+        bump_cache_version('tags')
+        bump_cache_version('recipes:list')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, рецептов {len(recipes)}'
+        ))
+
+    def log(self, message):
+        self.stdout.write(f'[{self.run}] {message}')
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f'user_{self.run}_{number}',
+                    email=f'user_{self.run}_{number}@example.com',
+                    first_name='Синтетический',
+                    last_name=f'Пользователь {number}',
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        self.log(f'пользователей: {len(users)}')
+        return [user.id for user in users]
+
+    def create_tags(self, count):
+        tags = list(Tag.objects.values_list('id', flat=True))
+        colors = set(Tag.objects.values_list('color', flat=True))
+        new_tags = []
+        for number in range(count - len(tags)):
+            color = f'#{random.randrange(0x1000000):06X}'
+            while color in colors:
+                color = f'#{random.randrange(0x1000000):06X}'
+            colors.add(color)
+            new_tags.append(Tag(
+                name=f'Тэг {self.run} {number}',
+                color=color,
+                slug=f'tag-{self.run}-{number}',
+            ))
+        tags += [tag.id for tag in Tag.objects.bulk_create(new_tags)]
+        self.log(f'тэгов: {len(tags)}')
+        return tags
+
+    def create_ingredients(self, count):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        new_ingredients = Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=f'Ингредиент {self.run} {number}',
+                    measurement_unit=random.choice(('г', 'мл', 'шт.')),
+                )
+                for number in range(count - len(ingredients))
+            ),
+            batch_size=self.batch_size,
+        )
+        ingredients += [ingredient.id for ingredient in new_ingredients]
+        random.shuffle(ingredients)
+        self.log(f'ингредиентов: {len(ingredients)}')
+        return ingredients
+
+    def create_recipes(self, count, users, tags, ingredients):
+        image = get_placeholder_image()
+        author_weights = zipf_weights(len(users))
+        tag_weights = zipf_weights(len(tags))
+        ingredient_weights = zipf_weights(len(ingredients))
+        recipe_ids = []
+
+        for start in range(0, count, self.batch_size):
+            authors = random.choices(
+                users,
+                cum_weights=author_weights,
+                k=min(self.batch_size, count - start),
+            )
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    name=f'Рецепт {self.run} {start + number}',
+                    text=f'Описание синтетического рецепта {start + number}.',
+                    author_id=author,
+                    image=image,
+                    cooking_time=random.randint(5, 180),
+                )
+                for number, author in enumerate(authors)
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag)
+                for recipe in recipes
+                for tag in sample_unique(
+                    tags, tag_weights, random.randint(1, 3)
+                )
+            )
+            AmountIngredient.objects.bulk_create(
+                AmountIngredient(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient,
+                    amount=random.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient in sample_unique(
+                    ingredients, ingredient_weights, random.randint(3, 12)
+                )
+            )
+            recipe_ids += [recipe.id for recipe in recipes]
+            self.log(f'рецептов: {len(recipe_ids)}')
+
+        spread_dates(Recipe, recipe_ids, 'pub_date')
+        return recipe_ids
+
+    def create_links(self, model, mean, users, recipes):
+        recipe_weights = zipf_weights(len(recipes))
+        links = [
+            model(user_id=user, recipe_id=recipe)
+            for user in users
+            for recipe in sample_unique(
+                recipes, recipe_weights, skewed_count(mean, len(recipes))
+            )
+        ]
+        links = model.objects.bulk_create(links, batch_size=self.batch_size)
+        spread_dates(model, [link.id for link in links], 'added')
+        self.log(f'{model._meta.verbose_name_plural}: {len(links)}')
+
+    def create_subscriptions(self, mean, users):
+        author_weights = zipf_weights(len(users))
+        subscriptions = [
+            Subscriptions(user_id=user, author_id=author)
+            for user in users
+            for author in sample_unique(
+                users, author_weights, skewed_count(mean, len(users) - 1)
+            )
+            if author != user
+        ]
+        Subscriptions.objects.bulk_create(
+            subscriptions, batch_size=self.batch_size
+        )
+        self.log(f'подписок: {len(subscriptions)}')
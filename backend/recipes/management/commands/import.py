@@ -1,30 +1,167 @@
 import csv
-import os
+import json
+from itertools import islice
+from pathlib import Path
 from typing import Any
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from api.signals import invalidate_ingredient_index
 from recipes.models import Ingredient
 
+BATCH_SIZE = 1000
+DEFAULT_FILE = 'copy.csv'
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file, delimiter=','):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json_lines(file):
+    for line in file:
+        if line.strip():
+            item = json.loads(line)
+            yield item['name'], item['measurement_unit']
+
+
+def iter_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Элементы массива JSON верхнего уровня по одному: файл читается
+    блоками, в памяти только текущий блок и разбираемый элемент.
+    """
+    decoder = json.JSONDecoder()
+    buffer, eof = '', False
+    expected, value_allowed = '[', False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and buffer[0] in expected:
+            char, buffer = buffer[0], buffer[1:]
+            if char == ']':
+                return
+            expected, value_allowed = (']' if char == '[' else ''), True
+            continue
+        if buffer and not value_allowed:
+            raise ValueError(f'ожидался один из символов {expected!r}')
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                end = None
+            # Число в конце блока может быть неполным: элемент принимается,
+            # только когда за ним уже прочитан разделитель.
+            if end is not None and (
+                buffer[end:].lstrip()[:1] in (',', ']') or eof
+            ):
+                yield item
+                buffer = buffer[end:]
+                expected, value_allowed = ',]', False
+                continue
+        if eof:
+            raise ValueError('массив JSON не закрыт или содержит ошибку')
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def read_json(file):
+    for item in iter_json_array(file):
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.jsonl': read_json_lines,
+    '.json': read_json,
+}
+
 
 def read(file_name):
-    csv_path = os.path.join(settings.BASE_DIR, file_name)
-    csv_file = open(csv_path, encoding='utf-8')
-    csv_reader = csv.reader(csv_file, delimiter=',')
-    return csv_reader
+    path = Path(settings.BASE_DIR, file_name)
+    reader = READERS.get(path.suffix.lower())
+    if reader is None:
+        raise CommandError(f'Неизвестный формат файла: {path.name}')
+    try:
+        with path.open(encoding='utf-8') as file:
+            for name, measurement_unit in reader(file):
+                name, measurement_unit = name.strip(), measurement_unit.strip()
+                if name and measurement_unit:
+                    yield name, measurement_unit
+    except FileNotFoundError:
+        raise CommandError(f'Файл не найден: {path}')
+    except (KeyError, TypeError, ValueError) as error:
+        raise CommandError(f'Неверные данные в файле {path.name}: {error}')
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def get_existing(batch):
+    names = {name for name, _ in batch}
+    return set(
+        Ingredient.objects.filter(name__in=names)
+        .values_list('name', 'measurement_unit')
+    )
 
 
 class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из файлов CSV (название, единица измерения), '
+        'JSON или JSON Lines пакетами, пропуская уже существующие.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files',
+            nargs='*',
+            default=(DEFAULT_FILE, ),
+            help='Пути к файлам относительно BASE_DIR или абсолютные.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одном запросе.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только подсчитать новые и существующие ингредиенты.',
+        )
 
     def handle(self, *args: Any, **options: Any) -> str | None:
-        reader = read('copy.csv')
-        i = 1
-        for row in reader:
-            obj, created = Ingredient.objects.get_or_create(
-                id=i,
-                name=row[0],
-                measurement_unit=row[1],
-            )
-            i += 1
-        print(' Success !')
+        inserted = existing = 0
+        for file_name in options['files']:
+            for batch in batches(read(file_name), options['batch_size']):
+                batch = list(dict.fromkeys(batch))
+                found = get_existing(batch)
+                new = [row for row in batch if row not in found]
+                if not options['dry_run']:
+                    Ingredient.objects.bulk_create(
+                        (
+                            Ingredient(
+                                name=name,
+                                measurement_unit=measurement_unit,
+                            )
+                            for name, measurement_unit in new
+                        ),
+                        ignore_conflicts=True,
+                    )
+                inserted += len(new)
+                existing += len(batch) - len(new)
+                self.stdout.write(
+                    f'{file_name}: новых {inserted}, существующих {existing}'
+                )
+
+        if inserted and not options['dry_run']:
+            invalidate_ingredient_index()
+        prefix = 'Будет добавлено' if options['dry_run'] else 'Добавлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: {inserted}, уже были в базе: {existing}'
+        ))
@@ -0,0 +1,80 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import AmountIngredient, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def get_live_totals():
+    totals = (
+        AmountIngredient.objects.filter(recipe__in_shopping_cart__isnull=False)
+        .values_list('recipe__in_shopping_cart__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    return {(user, ingredient): total for user, ingredient, total in totals}
+
+
+def get_stored_totals():
+    return {
+        (user, ingredient): total
+        for user, ingredient, total in ShoppingListItem.objects.values_list(
+            'user', 'ingredient', 'total_amount'
+        )
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает списки покупок пользователей '
+        'или сверяет их с корзинами покупок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить списки покупок, не изменяя их.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if options['check']:
+            return self.check_totals()
+
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user,
+                        ingredient_id=ingredient,
+                        total_amount=total,
+                    )
+                    for (user, ingredient), total in get_live_totals().items()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано строк: {ShoppingListItem.objects.count()}'
+        ))
+
+    def check_totals(self):
+        live = get_live_totals()
+        stored = get_stored_totals()
+        mismatches = [
+            (key, stored.get(key), live.get(key))
+            for key in live.keys() | stored.keys()
+            if stored.get(key) != live.get(key)
+        ]
+        for (user, ingredient), stored_total, live_total in mismatches:
+            self.stdout.write(
+                f'user={user} ingredient={ingredient}: '
+                f'сохранено {stored_total}, в корзинах {live_total}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Списки покупок совпадают.'))
@@ -0,0 +1,47 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import build_similar, refresh_similar
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассчитывает похожие рецепты по общим ингредиентам и тэгам. '
+        'По умолчанию пересчитывает только рецепты из очереди изменений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать похожие для всех рецептов.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Число рецептов, сравниваемых со всеми за шаг (с --full).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Число процессов для расчёта сходства (с --full).',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        if options['full']:
+            count, timings = build_similar(
+                options['chunk_size'], options['workers']
+            )
+        else:
+            count, timings = refresh_similar()
+
+        self.stdout.write(
+            'Признаки: {features:.2f} с, сходство: {compute:.2f} с, '
+            'запись: {save:.2f} с'.format(**timings)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {count} '
+            f'за {sum(timings.values()):.2f} с.'
+        ))
@@ -0,0 +1,27 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import RecipeRanking
+from recipes.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает популярность рецептов по новым добавлениям '
+        'в избранное и корзину. Предназначена для запуска по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Очистить таблицу и пересчитать события заново.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        updated = refresh_trending(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}, '
+            f'в рейтинге: {RecipeRanking.objects.count()}.'
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:04
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityQueue',
+            fields=[
+                ('recipe', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Рецепт')),
+                ('added', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+            ],
+            options={
+                'verbose_name': 'Рецепт для пересчёта похожих',
+                'verbose_name_plural': 'Очередь пересчёта похожих',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarRecipes',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similar_recipes', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('neighbours', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None, verbose_name='Похожие рецепты')),
+                ('scores', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None, verbose_name='Сходство')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата расчёта')),
+            ],
+            options={
+                'verbose_name': 'Похожие рецепты',
+                'verbose_name_plural': 'Похожие рецепты',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['neighbours'], name='similar_recipes_neighbours_idx')],
+            },
+        ),
+    ]
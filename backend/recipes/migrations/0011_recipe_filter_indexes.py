@@ -0,0 +1,34 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:51
+
+from django.db import migrations, models
+
+# Индекс промежуточной таблицы тэгов (тэг, рецепт) для фильтра по тэгам:
+# у автоматической таблицы ManyToManyField нет Meta, поэтому через SQL.
+RECIPE_TAGS_INDEX_SQL = '''
+    CREATE INDEX recipe_tags_tag_recipe_idx
+    ON recipes_recipe_tags (tag_id, recipe_id);
+'''
+
+RECIPE_TAGS_INDEX_REVERSE_SQL = '''
+    DROP INDEX IF EXISTS recipe_tags_tag_recipe_idx;
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favourites',
+            index=models.Index(fields=['user', 'recipe'], name='favourites_user_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', 'recipe'], name='shopping_cart_user_recipe_idx'),
+        ),
+        migrations.RunSQL(
+            RECIPE_TAGS_INDEX_SQL, RECIPE_TAGS_INDEX_REVERSE_SQL
+        ),
+    ]
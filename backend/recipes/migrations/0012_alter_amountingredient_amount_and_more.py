@@ -0,0 +1,29 @@
+# Generated by Django 4.2.4 on 2026-10-18 06:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='amountingredient',
+            name='amount',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1, 'Нужен хотя бы 1 элемент.'), django.core.validators.MaxValueValidator(1000, 'Слишком много ингредиентов.')], verbose_name='Количество ингредиента'),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='measurement_unit',
+            field=models.CharField(max_length=200, verbose_name='Единица измерения'),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=200, verbose_name='Ингредиент'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:24
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_counted_until(apps, schema_editor):
+    # События до прошлого пересчёта уже учтены по отметкам id.
+    RankingState = apps.get_model('recipes', 'RankingState')
+    RankingState.objects.update(counted_until=F('scored_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_alter_amountingredient_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='rankingstate',
+            name='carts_id',
+        ),
+        migrations.RemoveField(
+            model_name='rankingstate',
+            name='favourites_id',
+        ),
+        migrations.AddField(
+            model_name='rankingstate',
+            name='counted_until',
+            field=models.DateTimeField(null=True, verbose_name='События учтены до'),
+        ),
+        migrations.RunPython(set_counted_until, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='favourites',
+            index=models.Index(fields=['added'], name='favourites_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['added'], name='shopping_cart_added_idx'),
+        ),
+    ]
@@ -1,20 +1,28 @@
+from pathlib import Path
+from uuid import uuid4
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files import File
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
-from django.db.models import (CASCADE, CharField, DateTimeField, ForeignKey,
-                              ImageField, ManyToManyField, Model,
+from django.db.models import (CASCADE, BigIntegerField, CharField,
+                              DateTimeField, FloatField, ForeignKey,
+                              ImageField, Index, JSONField, ManyToManyField,
+                              Model, OneToOneField, PositiveIntegerField,
                               PositiveSmallIntegerField, TextField,
-                              UniqueConstraint)
-from PIL import Image
+                              UniqueConstraint, UUIDField)
 
+from api.counters import CounterFieldsMixin
 from api.validators import hex_color_validator
+from recipes.images import schedule_image_processing
 
 User = get_user_model()
 
 
-IMAGE_SIZE = 500, 500
-
-
 class Ingredient(Model):
     name = CharField(
         'Ингредиент',
@@ -77,7 +85,9 @@ class Tag(Model):
         return super().clean()
 
 
-class Recipe(Model):
+class Recipe(CounterFieldsMixin, Model):
+    counter_fields = ('favourites_count', 'in_carts_count')
+
     name = CharField(
         'Название рецепта',
         max_length=80
@@ -114,6 +124,12 @@ class Recipe(Model):
         'Изображение блюда',
         upload_to='recipe_images/',
     )
+    image_variants = JSONField(
+        'Копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     cooking_time = PositiveSmallIntegerField(
         'Время приготовления',
         validators=(
@@ -121,6 +137,21 @@ class Recipe(Model):
             MaxValueValidator(360),
         )
     )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    favourites_count = PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = PositiveIntegerField(
+        'В корзинах покупок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -132,15 +163,43 @@ class Recipe(Model):
                 name='unique_for_author',
             ),
         )
+        indexes = (
+            Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+            GinIndex(
+                fields=('search_vector', ),
+                name='recipe_search_vector_idx',
+            ),
+            GinIndex(
+                fields=('name', ),
+                name='recipe_name_trgm_idx',
+                opclasses=('gin_trgm_ops', ),
+            ),
+        )
 
     def __str__(self):
         return f'{self.name}. Автор: {self.author.username}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
     def save(self, *args, **kwargs):
+        image_changed = (
+            self.image.name != getattr(self, '_loaded_image', None)
+        )
         super().save(*args, **kwargs)
-        image = Image.open(self.image.path)
-        image.thumbnail(IMAGE_SIZE)
-        image.save(self.image.path)
+        if image_changed:
+            self._loaded_image = self.image.name
+            schedule_image_processing(self)
 
 
 class AmountIngredient(Model):
@@ -226,6 +285,16 @@ class ShoppingCart(BaseRecipeUserModel):
                      'в корзине покупок.\n',
             ),
         )
+        indexes = (
+            Index(
+                fields=('user', 'recipe'),
+                name='shopping_cart_user_recipe_idx',
+            ),
+            Index(
+                fields=('added', ),
+                name='shopping_cart_added_idx',
+            ),
+        )
 
     def __str__(self):
         return (f'{self.user.username} добавил(-ла) в корзину покупок: '
@@ -255,6 +324,277 @@ class Favourites(BaseRecipeUserModel):
                 name='\n%(app_label)s_%(class)s рецепт уже в избранном.\n',
             ),
         )
+        indexes = (
+            Index(
+                fields=('user', 'recipe'),
+                name='favourites_user_recipe_idx',
+            ),
+            Index(
+                fields=('added', ),
+                name='favourites_added_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.user.username} добавил(-ла) в избранное: {self.recipe}'
+
+
+class ShoppingListItem(Model):
+    """
+    Итоговое количество ингредиента в списке покупок пользователя.
+    Обновляется при изменении корзины покупок.
+    """
+
+    user = ForeignKey(
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+        to=User,
+        on_delete=CASCADE,
+    )
+    ingredient = ForeignKey(
+        verbose_name='Ингредиент',
+        related_name='in_shopping_lists',
+        to=Ingredient,
+        on_delete=CASCADE,
+    )
+    total_amount = PositiveIntegerField(
+        'Общее количество',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item',
+            ),
+        )
+
+    def __str__(self):
+        return (f'{self.user.username}: {self.total_amount} мерных единиц '
+                f'{self.ingredient}')
+
+
+class ImageUpload(Model):
+    """
+    Изображение рецепта, загружаемое по частям.
+    Части дописываются во временный файл в IMAGE_UPLOAD_ROOT.
+    """
+
+    id = UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+    )
+    user = ForeignKey(
+        verbose_name='Пользователь',
+        related_name='image_uploads',
+        to=User,
+        on_delete=CASCADE,
+    )
+    size = PositiveIntegerField(
+        'Размер файла',
+    )
+    offset = PositiveIntegerField(
+        'Загружено байт',
+        default=0,
+    )
+    image_format = CharField(
+        'Формат изображения',
+        max_length=10,
+        blank=True,
+    )
+    created = DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+        editable=False,
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+
+    def __str__(self):
+        return f'{self.user.username}: {self.offset} из {self.size} байт'
+
+    @property
+    def path(self):
+        return Path(settings.IMAGE_UPLOAD_ROOT) / f'{self.id}.part'
+
+    @property
+    def is_complete(self):
+        return bool(self.image_format) and self.offset == self.size
+
+    def open(self):
+        return File(
+            self.path.open('rb'),
+            name=f'{self.id}.{self.image_format.lower()}',
+        )
+
+    def delete(self, *args, **kwargs):
+        self.path.unlink(missing_ok=True)
+        return super().delete(*args, **kwargs)
+
+
+class RecipeRanking(Model):
+    """
+    Популярность рецепта: сумма добавлений в избранное и корзину,
+    затухающая со временем. Пересчитывается командой trending.
+    """
+
+    recipe = OneToOneField(
+        verbose_name='Рецепт',
+        related_name='ranking',
+        to=Recipe,
+        on_delete=CASCADE,
+        primary_key=True,
+    )
+    score = FloatField(
+        'Популярность',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = (
+            Index(
+                fields=('-score', '-recipe'),
+                name='recipe_ranking_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}: {self.score:.3f}'
+
+
+class RankingState(Model):
+    """
+    Отметка последнего пересчёта популярности: до какого времени
+    добавления события избранного и корзины уже учтены и на какой
+    момент посчитано затухание.
+    """
+
+    counted_until = DateTimeField(
+        'События учтены до',
+        null=True,
+    )
+    scored_at = DateTimeField(
+        'Дата пересчёта',
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = 'Состояние пересчёта популярности'
+        verbose_name_plural = 'Состояние пересчёта популярности'
+
+    def __str__(self):
+        return f'Популярность на {self.scored_at}'
+
+
+class SimilarRecipes(Model):
+    """
+    Ближайшие по составу и тэгам рецепты в порядке убывания сходства.
+    Рассчитываются командой similar.
+    """
+
+    recipe = OneToOneField(
+        verbose_name='Рецепт',
+        related_name='similar_recipes',
+        to=Recipe,
+        on_delete=CASCADE,
+        primary_key=True,
+    )
+    neighbours = ArrayField(
+        BigIntegerField(),
+        verbose_name='Похожие рецепты',
+    )
+    scores = ArrayField(
+        FloatField(),
+        verbose_name='Сходство',
+    )
+    updated = DateTimeField(
+        'Дата расчёта',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Похожие рецепты'
+        verbose_name_plural = 'Похожие рецепты'
+        indexes = (
+            GinIndex(
+                fields=('neighbours', ),
+                name='similar_recipes_neighbours_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}: {len(self.neighbours)} похожих'
+
+
+class SimilarityQueue(Model):
+    """
+    Рецепты, у которых изменились ингредиенты или тэги после
+    последнего расчёта похожих. Хранит только id, чтобы удаление
+    рецепта не зависело от очереди.
+    """
+
+    recipe = BigIntegerField(
+        'Рецепт',
+        primary_key=True,
+    )
+    added = DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Рецепт для пересчёта похожих'
+        verbose_name_plural = 'Очередь пересчёта похожих'
+
+    def __str__(self):
+        return f'Рецепт {self.recipe}'
+
+
+class FeedEntry(Model):
+    """
+    Рецепт в ленте подписчика автора. Записи добавляются
+    при публикации рецепта и при подписке на автора.
+    """
+
+    user = ForeignKey(
+        verbose_name='Подписчик',
+        related_name='feed',
+        to=User,
+        on_delete=CASCADE,
+    )
+    recipe = ForeignKey(
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+        to=Recipe,
+        on_delete=CASCADE,
+    )
+    pub_date = DateTimeField(
+        'Дата публикации',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        )
+        indexes = (
+            Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_entry_user_pub_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user.username}: {self.recipe}'
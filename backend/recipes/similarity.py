@@ -0,0 +1,337 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from scipy.sparse import csr_matrix, diags
+
+from api.caching import bump_cache_version
+from api.indexes import fetch_pairs
+from recipes.models import (AmountIngredient, Recipe, SimilarityQueue,
+                            SimilarRecipes)
+
+TAG_WEIGHT = 0.2
+FREQUENT_SHARE = 0.05
+FREQUENT_MIN = 1000
+CHUNK_CELLS = 20_000_000
+MAX_CHUNK_SIZE = 2000
+FETCH_SIZE = 10_000
+BATCH_SIZE = 1000
+SCORE_BUCKETS = 256
+
+
+class SimilarityIndex:
+    """
+    Разреженная матрица рецепт × ингредиент и сходство наборов тэгов.
+
+    Веса признаков — IDF, строки нормированы, поэтому произведение
+    строк даёт косинусное сходство. Кандидаты в похожие ищутся только
+    по ингредиентам: слишком частые (соль, вода) исключаются, иначе
+    почти любая пара рецептов становится кандидатом. Тэгов немного,
+    поэтому сходство считается сразу для всех встречающихся наборов
+    тэгов и добавляется к сходству кандидатов с весом TAG_WEIGHT.
+    """
+
+    def __init__(self):
+        self.count = settings.SIMILAR_RECIPES_COUNT
+        self.recipe_ids = np.fromiter(
+            Recipe.objects.order_by('id').values_list('id', flat=True)
+            .iterator(chunk_size=FETCH_SIZE),
+            dtype=np.int64,
+        )
+        self.ingredients = self.build_matrix(
+            fetch_pairs(
+                AmountIngredient.objects.all(),
+                ('recipe_id', 'ingredient_id'),
+            ),
+            drop_frequent=True,
+        )
+        tags = self.build_matrix(
+            fetch_pairs(
+                Recipe.tags.through.objects.all(), ('recipe_id', 'tag_id')
+            )
+        ).toarray()
+        combinations, self.tag_sets = np.unique(
+            tags, axis=0, return_inverse=True
+        )
+        self.tag_scores = combinations @ combinations.T
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def get_rows(self, recipe_ids):
+        """Номера строк для id рецептов, которые есть в индексе."""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        rows = np.searchsorted(self.recipe_ids, recipe_ids)
+        found = rows < len(self)
+        found[found] = self.recipe_ids[rows[found]] == recipe_ids[found]
+        return rows[found]
+
+    def build_matrix(self, pairs, drop_frequent=False):
+        rows = np.searchsorted(self.recipe_ids, pairs[:, 0])
+        known = rows < len(self)
+        known[known] = self.recipe_ids[rows[known]] == pairs[known, 0]
+        features, columns = np.unique(pairs[known, 1], return_inverse=True)
+        frequency = np.bincount(columns, minlength=len(features))
+        weights = np.log((1 + len(self)) / (1 + frequency)) + 1
+        if drop_frequent:
+            weights[
+                frequency > max(FREQUENT_MIN, FREQUENT_SHARE * len(self))
+            ] = 0
+        matrix = csr_matrix(
+            (weights[columns], (rows[known], columns)),
+            shape=(len(self), len(features)),
+            dtype=np.float32,
+        )
+        matrix.eliminate_zeros()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)))
+        norms[norms == 0] = 1
+        return csr_matrix(diags(1 / norms.ravel()) @ matrix)
+
+    def get_chunk_size(self):
+        """Сколько строк считать за раз, чтобы ограничить память."""
+        return max(1, min(MAX_CHUNK_SIZE, CHUNK_CELLS // max(len(self), 1)))
+
+    def get_scores(self, rows):
+        """
+        Сходство строк rows со всеми рецептами, у которых есть общий
+        ингредиент: номер строки в rows, столбец (строка индекса)
+        и сходство. Пары рецепта с самим собой исключены.
+        """
+        candidates = self.ingredients[rows] @ self.ingredients.T
+        local = np.repeat(
+            np.arange(len(rows)), np.diff(candidates.indptr)
+        )
+        columns = candidates.indices
+        other = rows[local] != columns
+        local, columns = local[other], columns[other]
+        tag_scores = self.tag_scores[
+            self.tag_sets[rows[local]], self.tag_sets[columns]
+        ]
+        scores = (
+            (1 - TAG_WEIGHT) * candidates.data[other]
+            + TAG_WEIGHT * tag_scores
+        )
+        return local, columns, scores
+
+    def get_neighbours(self, rows):
+        """Первые count кандидатов каждой строки по убыванию сходства."""
+        local, columns, scores = self.get_scores(rows)
+
+        # Гистограмма сходства по строкам даёт для каждой строки порог,
+        # выше которого заведомо есть count кандидатов: сортировать
+        # приходится только их, а не всех кандидатов.
+        buckets = np.clip(
+            (scores * (SCORE_BUCKETS - 1)).astype(np.int64),
+            0,
+            SCORE_BUCKETS - 1,
+        )
+        histogram = np.bincount(
+            local * SCORE_BUCKETS + buckets,
+            minlength=len(rows) * SCORE_BUCKETS,
+        ).reshape(len(rows), SCORE_BUCKETS)
+        above = np.cumsum(histogram[:, ::-1], axis=1)[:, ::-1]
+        threshold = np.maximum((above >= self.count).sum(axis=1) - 1, 0)
+        keep = buckets >= threshold[local]
+        local, columns, scores = local[keep], columns[keep], scores[keep]
+
+        # Сходство не больше 1, поэтому ключ упорядочивает по строке,
+        # а внутри строки — по убыванию сходства.
+        order = np.argsort(2.0 * local + (1 - scores), kind='stable')
+        local, columns, scores = local[order], columns[order], scores[order]
+        counts = np.bincount(local, minlength=len(rows))
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        top = np.arange(len(local)) - starts < self.count
+        return local[top], columns[top], scores[top]
+
+
+def save_similar(items):
+    """Сохраняет списки похожих: пары (id рецепта, [(id, сходство)])."""
+    items = dict(items)
+    existing = Recipe.objects.filter(id__in=list(items)).values_list(
+        'id', flat=True
+    )
+    SimilarRecipes.objects.bulk_create(
+        (
+            SimilarRecipes(
+                recipe_id=recipe_id,
+                neighbours=[neighbour for neighbour, _ in items[recipe_id]],
+                scores=[round(score, 4) for _, score in items[recipe_id]],
+            )
+            for recipe_id in existing
+        ),
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=('recipe', ),
+        update_fields=('neighbours', 'scores', 'updated'),
+    )
+
+
+def compute_similar(index, rows):
+    """Списки похожих для строк rows в формате save_similar."""
+    local, columns, scores = index.get_neighbours(rows)
+    bounds = np.searchsorted(local, np.arange(len(rows) + 1))
+    neighbours = index.recipe_ids[columns].tolist()
+    scores = scores.tolist()
+    return [
+        (
+            int(index.recipe_ids[row]),
+            list(zip(neighbours[start:end], scores[start:end])),
+        )
+        for row, start, end in zip(rows, bounds[:-1], bounds[1:])
+    ]
+
+
+shared_index = None
+
+
+def compute_shared(rows):
+    return compute_similar(shared_index, rows)
+
+
+def compute_chunks(index, chunk_size, workers):
+    """
+    Списки похожих по частям. При workers > 1 части считаются
+    в дочерних процессах, которые получают индекс при fork;
+    в работе одновременно не больше двух частей на процесс.
+    """
+    chunks = (
+        np.arange(offset, min(offset + chunk_size, len(index)))
+        for offset in range(0, len(index), chunk_size)
+    )
+    if workers <= 1:
+        for rows in chunks:
+            yield compute_similar(index, rows)
+        return
+
+    global shared_index
+    shared_index = index
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=get_context('fork')
+    ) as pool:
+        pending = deque()
+        for rows in chunks:
+            pending.append(pool.submit(compute_shared, rows))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    shared_index = None
+
+
+def build_similar(chunk_size=None, workers=1):
+    """
+    Полный пересчёт похожих для всех рецептов по частям
+    из chunk_size строк в workers процессах.
+    Возвращает число рецептов и время этапов.
+    """
+    started = timezone.now()
+    timings = {'features': 0.0, 'compute': 0.0, 'save': 0.0}
+
+    start = perf_counter()
+    index = SimilarityIndex()
+    timings['features'] = perf_counter() - start
+
+    chunks = compute_chunks(
+        index, chunk_size or index.get_chunk_size(), workers
+    )
+    while True:
+        start = perf_counter()
+        similar = next(chunks, None)
+        timings['compute'] += perf_counter() - start
+        if similar is None:
+            break
+
+        start = perf_counter()
+        save_similar(similar)
+        timings['save'] += perf_counter() - start
+
+    SimilarityQueue.objects.filter(added__lte=started).delete()
+    bump_cache_version('recipes:list')
+    return len(index), timings
+
+
+def merge_similar(stored, added, count):
+    """Список похожих с добавленными парами added."""
+    merged = dict(stored)
+    merged.update(added)
+    return sorted(
+        merged.items(), key=lambda item: (-item[1], item[0])
+    )[:count]
+
+
+def refresh_similar():
+    """
+    Пересчёт похожих для рецептов из очереди.
+
+    Их собственные списки и списки, в которых они уже есть, считаются
+    заново. В остальные рассчитанные списки изменённые рецепты только
+    вставляются по новому сходству. Веса IDF остальных рецептов при
+    этом не пересчитываются, поэтому время от времени нужен полный
+    пересчёт. Возвращает число рецептов из очереди и время этапов.
+    """
+    started = timezone.now()
+    timings = {'features': 0.0, 'compute': 0.0, 'save': 0.0}
+    queued = list(SimilarityQueue.objects.values_list('recipe', flat=True))
+    if not queued:
+        return 0, timings
+
+    start = perf_counter()
+    index = SimilarityIndex()
+    containing = set(
+        SimilarRecipes.objects.filter(neighbours__overlap=queued)
+        .values_list('recipe', flat=True)
+    )
+    queued_rows = index.get_rows(queued)
+    rows = np.union1d(queued_rows, index.get_rows(list(containing)))
+    timings['features'] = perf_counter() - start
+
+    chunk_size = index.get_chunk_size()
+    for offset in range(0, len(rows), chunk_size):
+        start = perf_counter()
+        similar = compute_similar(index, rows[offset:offset + chunk_size])
+        timings['compute'] += perf_counter() - start
+
+        start = perf_counter()
+        save_similar(similar)
+        timings['save'] += perf_counter() - start
+
+    start = perf_counter()
+    skipped = containing.union(queued)
+    added = {}
+    for offset in range(0, len(queued_rows), chunk_size):
+        chunk = queued_rows[offset:offset + chunk_size]
+        local, columns, scores = index.get_scores(chunk)
+        for recipe_id, other_id, score in zip(
+            index.recipe_ids[chunk[local]].tolist(),
+            index.recipe_ids[columns].tolist(),
+            scores.tolist(),
+        ):
+            if other_id not in skipped:
+                added.setdefault(other_id, {})[recipe_id] = score
+    timings['compute'] += perf_counter() - start
+
+    start = perf_counter()
+    affected = list(added)
+    for offset in range(0, len(affected), BATCH_SIZE):
+        stored = SimilarRecipes.objects.filter(
+            recipe__in=affected[offset:offset + BATCH_SIZE]
+        ).values_list('recipe', 'neighbours', 'scores')
+        changed = []
+        for recipe_id, neighbours, scores in stored:
+            merged = merge_similar(
+                zip(neighbours, scores), added[recipe_id], index.count
+            )
+            if any(neighbour in added[recipe_id] for neighbour, _ in merged):
+                changed.append((recipe_id, merged))
+        save_similar(changed)
+    timings['save'] += perf_counter() - start
+
+    SimilarityQueue.objects.filter(
+        recipe__in=queued, added__lte=started
+    ).delete()
+    bump_cache_version('recipes:list')
+    return len(queued), timings
@@ -0,0 +1,105 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.caching import bump_cache_version
+from recipes.models import (Favourites, RankingState, Recipe, RecipeRanking,
+                            ShoppingCart)
+
+TRENDING_EVENTS = (
+    (Favourites, 1.0),
+    (ShoppingCart, 2.0),
+)
+MIN_SCORE = 0.01
+BATCH_SIZE = 1000
+
+
+def decay(seconds):
+    """Множитель затухания веса события за прошедшее время."""
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return 0.5 ** (seconds / half_life)
+
+
+def collect_scores(state, now):
+    """
+    Веса событий избранного и корзины, добавленных после отметки
+    state, с затуханием на момент now.
+
+    Отметка сдвигается не до now, а до now - TRENDING_LAG_SECONDS:
+    время добавления ставится до фиксации транзакции, и строка
+    с более ранним временем может стать видна уже после пересчёта.
+    Такие строки учитываются следующим пересчётом, если транзакция
+    длилась меньше TRENDING_LAG_SECONDS.
+    """
+    since = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    until = now - timedelta(seconds=settings.TRENDING_LAG_SECONDS)
+    if state.counted_until is not None:
+        since = max(since, state.counted_until)
+    scores = defaultdict(float)
+    if since < until:
+        for model, weight in TRENDING_EVENTS:
+            events = model.objects.filter(
+                added__gt=since, added__lte=until
+            ).values_list('recipe_id', 'added')
+            for recipe_id, added in events.iterator(chunk_size=BATCH_SIZE):
+                scores[recipe_id] += weight * decay(
+                    (now - added).total_seconds()
+                )
+        state.counted_until = until
+    return scores
+
+
+def refresh_trending(rebuild=False):
+    """
+    Обновляет таблицу популярности: уменьшает накопленные оценки
+    на затухание с прошлого пересчёта, удаляет угасшие и добавляет
+    веса новых событий. Возвращает число обновлённых рецептов.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        state, _ = RankingState.objects.select_for_update().get_or_create(
+            pk=1
+        )
+        if rebuild:
+            RecipeRanking.objects.all().delete()
+            state = RankingState(pk=1)
+        elif state.scored_at is not None:
+            RecipeRanking.objects.update(
+                score=F('score') * decay(
+                    (now - state.scored_at).total_seconds()
+                )
+            )
+            RecipeRanking.objects.filter(score__lt=MIN_SCORE).delete()
+
+        scores = collect_scores(state, now)
+        recipe_ids = list(scores)
+        recipes = Recipe.objects.filter(id__in=recipe_ids).values_list(
+            'id', flat=True
+        )
+        current = dict(
+            RecipeRanking.objects.filter(recipe__in=recipe_ids).values_list(
+                'recipe', 'score'
+            )
+        )
+        RecipeRanking.objects.bulk_create(
+            (
+                RecipeRanking(
+                    recipe_id=recipe_id,
+                    score=current.get(recipe_id, 0) + scores[recipe_id],
+                )
+                for recipe_id in recipes
+            ),
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=('recipe', ),
+            update_fields=('score', ),
+        )
+
+        state.scored_at = now
+        state.save()
+    bump_cache_version('recipes:trending')
+    return len(scores)
@@ -12,6 +12,8 @@ class CustomUserAdmin(UserAdmin):
         'last_name',
         'email',
         'is_active',
+        'recipes_count',
+        'followers_count',
     )
     fields = (
         (
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-18 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_customuser_first_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptions',
+            index=models.Index(fields=['user', '-added', '-id'], name='subscriptions_user_added_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.4 on 2026-10-18 04:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='subscriptions',
+            options={'verbose_name': 'Подписка', 'verbose_name_plural': 'Подписки'},
+        ),
+        migrations.RemoveConstraint(
+            model_name='subscriptions',
+            name='\nНельзя подписаться на себя!\n',
+        ),
+        migrations.RemoveConstraint(
+            model_name='subscriptions',
+            name='\nПовторно подписаться нельзя!\n',
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='password',
+            field=models.CharField(help_text=('Обязательное к заполнению поле. ', 'Максимальная длина - 64 символа.'), max_length=512, verbose_name='Пароль'),
+        ),
+        migrations.AlterField(
+            model_name='subscriptions',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик автора'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriptions',
+            constraint=models.UniqueConstraint(fields=('author', 'user'), name='\nНельзя подписаться повторно!\n'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriptions',
+            constraint=models.CheckConstraint(check=models.Q(('author', models.F('user')), _negated=True), name='\nНельзя подписаться на себя!\n'),
+        ),
+    ]
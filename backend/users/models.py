@@ -1,15 +1,19 @@
 from django.contrib.auth.models import AbstractUser
 from django.db.models import (CASCADE, BooleanField, CharField,
                               CheckConstraint, DateTimeField, EmailField, F,
-                              ForeignKey, Model, Q, UniqueConstraint)
+                              ForeignKey, Index, Model, PositiveIntegerField,
+                              Q, UniqueConstraint)
 from django.db.models.functions import Length
 
+from api.counters import CounterFieldsMixin
 from api.validators import MinLenValidator
 
 CharField.register_lookup(Length)
 
 
-class CustomUser(AbstractUser):
+class CustomUser(CounterFieldsMixin, AbstractUser):
+    counter_fields = ('recipes_count', 'followers_count')
+
     username = CharField(
         'Юзернейм',
         max_length=30,
@@ -52,6 +56,16 @@ class CustomUser(AbstractUser):
         'Активен',
         default=True,
     )
+    recipes_count = PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -67,6 +81,15 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return f'{self.username}: {self.email}'
 
+    def refresh_from_db(self, using=None, fields=None):
+        # Пользователь из кэша токенов загружен без большинства полей:
+        # при обращении к любому из них загружаются сразу все.
+        if fields is not None:
+            deferred = self.get_deferred_fields()
+            if deferred.intersection(fields):
+                fields = deferred.union(fields)
+        super().refresh_from_db(using, fields)
+
 
 class Subscriptions(Model):
     author = ForeignKey(
@@ -100,6 +123,12 @@ class Subscriptions(Model):
                 name='\nНельзя подписаться на себя!\n',
             ),
         )
+        indexes = (
+            Index(
+                fields=('user', '-added', '-id'),
+                name='subscriptions_user_added_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.user.username} подписался на: {self.author.username}'